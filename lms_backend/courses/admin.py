@@ -1,9 +1,43 @@
 from django.contrib import admin
-from .models import Course, Lesson, Profile, Enrollment, Review
+from . import caching
+from .models import Course, CourseDailyStats, Lesson, MediaJob, RollupWatermark, Profile, Enrollment, Review
 # Register your models here.
 
 admin.site.register(Course)
 admin.site.register(Lesson)
 admin.site.register(Profile)
-admin.site.register(Enrollment)
-admin.site.register(Review)
\ No newline at end of file
+admin.site.register(Review)
+admin.site.register(MediaJob)
+admin.site.register(RollupWatermark)
+
+
+# deleting enrollments here also retires the students' cached enrollment sets
+@admin.register(Enrollment)
+class EnrollmentAdmin(admin.ModelAdmin):
+    list_display = ('student', 'course', 'enrolled_at')
+    list_select_related = ('student', 'course')
+    raw_id_fields = ('student', 'course')
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        caching.invalidate_enrollments([obj.student_id])
+
+    def delete_queryset(self, request, queryset):
+        student_ids = set(queryset.values_list('student_id', flat=True))
+        super().delete_queryset(request, queryset)
+        caching.invalidate_enrollments(student_ids)
+
+
+# reporting dashboard over the daily rollup (never scans Enrollment/Review)
+@admin.register(CourseDailyStats)
+class CourseDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'course', 'enrollments', 'reviews', 'average_rating')
+    list_filter = ('course__category',)
+    date_hierarchy = 'date'
+    list_select_related = ('course',)
+    search_fields = ('course__title',)
+    ordering = ('-date', 'course')
+
+    @admin.display(description='Average rating')
+    def average_rating(self, obj):
+        return round(obj.rating_sum / obj.reviews, 2) if obj.reviews else None
@@ -0,0 +1,161 @@
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Course, CourseDailyStats, Enrollment, Review, RollupWatermark
+
+# Daily rollups and instructor analytics.
+#
+# CourseDailyStats holds enrollments, reviews and rating sums per course and day.
+# `manage.py rollup_course_stats` adds the rows created since its high-water mark
+# (RollupWatermark), so each run only reads new rows. Reports read the rollup plus the
+# few raw rows newer than the mark. Every query is grouped, never one per course.
+
+WATERMARK = 'course_daily_stats'
+STAT_FIELDS = ['enrollments', 'reviews', 'rating_sum']
+
+
+def day_start(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def average(total, count):
+    return round(total / count, 2) if count else None
+
+
+def _daily_counts(queryset, date_field, **aggregates):
+    return (queryset.annotate(date=TruncDate(date_field)).order_by()
+            .values('course_id', 'date').annotate(**aggregates))
+
+
+def daily_rows(start, end):
+    # {(course_id, date): {'enrollments': n, 'reviews': n, 'rating_sum': n}} for source rows in [start, end)
+    rows = {}
+    enrollments = Enrollment.objects.filter(enrolled_at__gte=start, enrolled_at__lt=end)
+    for row in _daily_counts(enrollments, 'enrolled_at', enrollments=Count('id')):
+        rows.setdefault((row['course_id'], row['date']), Counter())['enrollments'] = row['enrollments']
+    reviews = Review.objects.filter(created_at__gte=start, created_at__lt=end)
+    for row in _daily_counts(reviews, 'created_at', reviews=Count('id'), rating_sum=Sum('rating')):
+        counts = rows.setdefault((row['course_id'], row['date']), Counter())
+        counts.update(reviews=row['reviews'], rating_sum=row['rating_sum'])
+    return rows
+
+
+def _apply(rows):
+    # add the counts onto the existing CourseDailyStats rows, creating missing ones
+    existing = {}
+    course_ids = sorted({course_id for course_id, _ in rows})
+    for i in range(0, len(course_ids), 1000):
+        chunk = CourseDailyStats.objects.filter(course_id__in=course_ids[i:i + 1000],
+                                                date__in={date for _, date in rows})
+        existing.update({(stats.course_id, stats.date): stats for stats in chunk})
+    created, updated = [], []
+    for (course_id, date), counts in rows.items():
+        stats = existing.get((course_id, date))
+        if stats is None:
+            created.append(CourseDailyStats(course_id=course_id, date=date, **counts))
+            continue
+        for field in STAT_FIELDS:
+            setattr(stats, field, getattr(stats, field) + counts[field])
+        updated.append(stats)
+    CourseDailyStats.objects.bulk_create(created, batch_size=1000)
+    CourseDailyStats.objects.bulk_update(updated, STAT_FIELDS, batch_size=1000)
+    return len(created) + len(updated)
+
+
+def rollup_upper_bound():
+    # leave recent rows for the next run: a transaction still open now may commit
+    # rows whose enrolled_at/created_at lies just before the new high-water mark
+    return timezone.now() - timedelta(seconds=settings.ROLLUP_SAFETY_LAG)
+
+
+def watermark():
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('processed_until', flat=True).first()
+
+
+# add the enrollments and reviews created since the last run; the first run
+# (no high-water mark yet) builds everything
+@transaction.atomic
+def update_daily_stats():
+    mark = RollupWatermark.objects.select_for_update().filter(name=WATERMARK).first()
+    if mark is None:
+        return rebuild_daily_stats()
+    upper = rollup_upper_bound()
+    if upper <= mark.processed_until:
+        return 0
+    changed = _apply(daily_rows(mark.processed_until, upper))
+    mark.processed_until = upper
+    mark.save(update_fields=['processed_until'])
+    return changed
+
+
+# recompute every day from `since` (all history when None) and move the high-water mark
+@transaction.atomic
+def rebuild_daily_stats(since=None):
+    upper = rollup_upper_bound()
+    RollupWatermark.objects.select_for_update().filter(name=WATERMARK).first()
+    start = day_start(since) if since else datetime.min.replace(tzinfo=dt_timezone.utc)
+    stale = CourseDailyStats.objects.all()
+    if since:
+        stale = stale.filter(date__gte=since)
+    stale.delete()
+    changed = _apply(daily_rows(start, upper))
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'processed_until': upper})
+    return changed
+
+
+def instructor_analytics(user, days=30):
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+
+    rows = list(Course.objects.filter(instructor_id=user.id).order_by('-created_at')
+                .values('id', 'title', 'published', 'enrollment_count', 'rating_sum', 'rating_count'))
+    courses = [
+        {
+            'id': row['id'],
+            'title': row['title'],
+            'published': row['published'],
+            'enrollment_count': row['enrollment_count'],
+            'review_count': row['rating_count'],
+            'average_rating': average(row['rating_sum'], row['rating_count']),
+        }
+        for row in rows
+    ]
+
+    # rolled-up days, then the raw rows the rollup job has not reached yet
+    by_day = {start + timedelta(days=i): Counter() for i in range(days)}
+    mark = watermark()
+    rolled_up = (CourseDailyStats.objects.filter(course__instructor_id=user.id, date__gte=start)
+                 .values('date').annotate(enrollments=Sum('enrollments'), reviews=Sum('reviews'),
+                                          rating_sum=Sum('rating_sum')))
+    for row in rolled_up if mark else ():
+        by_day[row['date']].update({field: row[field] for field in STAT_FIELDS})
+    since = max(mark, day_start(start)) if mark else day_start(start)
+    enrollments = (Enrollment.objects.filter(course__instructor_id=user.id, enrolled_at__gte=since)
+                   .annotate(date=TruncDate('enrolled_at')).order_by().values('date').annotate(n=Count('id')))
+    for row in enrollments:
+        by_day[row['date']]['enrollments'] += row['n']
+    reviews = (Review.objects.filter(course__instructor_id=user.id, created_at__gte=since)
+               .annotate(date=TruncDate('created_at')).order_by().values('date')
+               .annotate(n=Count('id'), total=Sum('rating')))
+    for row in reviews:
+        by_day[row['date']].update(reviews=row['n'], rating_sum=row['total'])
+
+    total_reviews = sum(row['rating_count'] for row in rows)
+    return {
+        'total_courses': len(courses),
+        'total_enrollments': sum(course['enrollment_count'] for course in courses),
+        'total_reviews': total_reviews,
+        'average_rating': average(sum(row['rating_sum'] for row in rows), total_reviews),
+        'courses': courses,
+        'daily': [
+            {'date': date, 'enrollments': counts['enrollments'], 'reviews': counts['reviews'],
+             'average_rating': average(counts['rating_sum'], counts['reviews'])}
+            for date, counts in sorted(by_day.items())
+        ],
+    }
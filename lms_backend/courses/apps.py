@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
+
+    def ready(self):
+        from . import instrumentation  # noqa: F401  registers the query recorder
+        from . import search  # noqa: F401  registers the search index signals
@@ -0,0 +1,106 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+
+from . import caching, recommendations, views
+from .authentication import aauthenticate
+from .conditional import aenrolled_course_ids, async_course_detail_condition, async_course_reviews_condition
+from .db.routers import replica_reads
+from .models import Course, Review
+from .serializers import CourseSerializer, ReviewSerializer, image_srcset
+
+# Async versions of the hot read endpoints, used when the app runs under ASGI
+# (settings.ASYNC_READ_VIEWS, set by asgi.py). GET and HEAD are answered here with the
+# async ORM; other methods and catalog cache misses go to the regular DRF view in a
+# worker thread. Responses match the DRF views.
+#
+# Cache calls stay synchronous: Django's a*() cache methods are only a thread hop
+# around the same call for our backends.
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def not_authenticated(detail):
+    response = json_response(detail if isinstance(detail, dict) else {'detail': detail}, status=401)
+    response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+def async_read(sync_view):
+    def decorator(async_get):
+        @csrf_exempt  # as for the DRF views: JWT only, no session cookies
+        @wraps(async_get)
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            try:
+                request.user = await aauthenticate(request)
+            except AuthenticationFailed as e:  # includes simplejwt's InvalidToken
+                return not_authenticated(e.detail)
+            return await async_get(request, *args, **kwargs)
+        return view
+    return decorator
+
+
+sync_course_list = views.CourseList.as_view()
+
+
+@async_read(sync_course_list)
+async def course_list(request):
+    # catalog pages are cached by url; a miss needs the filters and cursor pagination
+    # (and reads from a replica there)
+    data = caching.get_cached(caching.catalog_page_key(request))
+    if data is None:
+        return await sync_to_async(sync_course_list)(request)
+    return json_response(data)
+
+
+@async_read(views.CourseDetailView.as_view())
+@replica_reads
+@async_course_detail_condition
+async def course_detail(request, course_id):
+    enrolled = course_id in await aenrolled_course_ids(request)  # loaded for the ETag already
+    cached = caching.get_cached(caching.course_detail_key(course_id))
+    if cached is not None and cached['instructor_id'] != request.user.id:
+        response = json_response({**cached['data'], 'is_enrolled': enrolled})
+    else:
+        course = await Course.objects.for_catalog().filter(id=course_id).afirst()
+        if course is None or (not course.published and course.instructor_id != request.user.id):
+            response = json_response({'error': 'Course not found'}, status=404)
+        else:
+            course_data = {**CourseSerializer(course, context={'request': request, 'enrolled': enrolled}).data,
+                           'also_taken': await recommendations.aalso_taken(course.id)}
+            if course.published and course.instructor_id != request.user.id:
+                caching.set_course_detail(course.id, course.instructor_id, course_data)
+            response = json_response({**course_data, 'is_enrolled': enrolled})
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+@async_read(views.CourseReviewListCreateView.as_view())
+@replica_reads
+@async_course_reviews_condition
+async def course_reviews(request, course_id):
+    reviews = Review.objects.filter(course_id=course_id).select_related('student__profile')
+    return json_response(ReviewSerializer([review async for review in reviews], many=True).data)
+
+
+@async_read(views.EnrolledCoursesView.as_view())
+@replica_reads
+async def enrolled_courses(request):
+    if not request.user.is_authenticated:
+        return not_authenticated('Authentication credentials were not provided.')
+    courses = Course.objects.filter(id__in=await aenrolled_course_ids(request), published=True)
+    return json_response([
+        {'id': course.id, 'title': course.title, 'description': course.description,
+         'thumbnail': course.thumbnail.url if course.thumbnail else None,
+         'thumbnail_srcset': image_srcset(course.thumbnail, course.thumbnail_variants)}
+        async for course in courses
+    ])
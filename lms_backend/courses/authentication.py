@@ -0,0 +1,71 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+# JWT authentication without a User/Profile query per request.
+#
+# Access tokens carry the user's role, profile id, username and staff flag as claims
+# (see add_user_claims), and TokenUserAuthentication builds request.user from them.
+# Views compare ids (`course.instructor_id == request.user.id`) and ask user_role()
+# for the role, so they work with both a ClaimsUser and a real User. The few views
+# that need the User row itself (profile editing) set JWTAuthentication instead.
+#
+# Role changes: the claims are re-read from the database whenever the client
+# refreshes its token, so a new role (or staff flag) applies within
+# SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'] at the latest. Set JWT_TOKEN_USER = False to
+# load the User on every request instead.
+
+USER_CLAIMS = ('role', 'profile_id', 'username', 'is_staff')
+
+
+def add_user_claims(token, user):
+    profile = getattr(user, 'profile', None)
+    token['role'] = profile.role if profile else None
+    token['profile_id'] = profile.id if profile else None
+    token['username'] = user.username
+    token['is_staff'] = user.is_staff
+    return token
+
+
+class ClaimsUser(TokenUser):
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def profile_id(self):
+        return self.token.get('profile_id')
+
+
+def claims_user(token):
+    # None for tokens issued before the claims existed: those still go through the database
+    if settings.JWT_TOKEN_USER and all(claim in token for claim in USER_CLAIMS):
+        return ClaimsUser(token)
+    return None
+
+
+class TokenUserAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        return claims_user(validated_token) or super().get_user(validated_token)
+
+
+# authenticate() for the async read views: the token check is pure CPU, only tokens
+# without the claims need the database
+async def aauthenticate(request):
+    auth = TokenUserAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return AnonymousUser()
+    token = auth.get_validated_token(raw_token)
+    return claims_user(token) or await sync_to_async(auth.get_user)(token)
+
+
+def user_role(user):
+    if isinstance(user, ClaimsUser):
+        return user.role
+    profile = getattr(user, 'profile', None)
+    return profile.role if profile else None
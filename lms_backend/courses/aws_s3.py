@@ -1,31 +1,154 @@
+import logging
+import math
+import threading
+import time
+
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# S3 limits for multipart uploads
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+# botocore clients are thread-safe, so one client (and its connection pool) is
+# shared by every request thread in the process instead of one client per upload
+_client = None
+_resource_class = None
+_client_lock = threading.Lock()
+
+def get_client_config():
+    return Config(
+        max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS,
+        retries={'max_attempts': 5, 'mode': 'standard'},
+    )
+
+def get_transfer_config():
+    return TransferConfig(
+        multipart_threshold=settings.AWS_S3_MULTIPART_THRESHOLD,
+        multipart_chunksize=settings.AWS_S3_MULTIPART_CHUNKSIZE,
+        max_concurrency=settings.AWS_S3_MAX_CONCURRENCY,
+        use_threads=True,
+    )
+
+def get_s3_client():
+    global _client, _resource_class
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # made through a resource, so get_s3_resource can build more resources
+                # on this same client
+                resource = boto3.resource(
+                    's3',
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_REGION,
+                    config=get_client_config(),
+                )
+                _resource_class = type(resource)
+                _client = resource.meta.client
+    return _client
+
+def get_s3_resource():
+    # boto3 resources are not thread-safe, but they are only a thin layer over their
+    # client: a new one on the shared client has no session or connection pool of its own
+    client = get_s3_client()
+    return _resource_class(client=client)
+
+def reset_s3_client():
+    global _client, _resource_class
+    with _client_lock:
+        _client = _resource_class = None
+
+@receiver(setting_changed)
+def reset_s3_client_on_setting_change(setting, **kwargs):
+    # e.g. override_settings() in tests swapping credentials or region
+    if setting.startswith('AWS_'):
+        reset_s3_client()
+
+def s3_file_url(bucket_name, file_name):
+    return f"https://{bucket_name}.s3.amazonaws.com/{file_name}"
+
+def log_transfer(action, bucket_name, file_name, size, started):
+    duration = time.monotonic() - started
+    throughput = size / duration / (1024 * 1024) if size and duration else None
+    logger.info(
+        "S3 %s %s/%s: %s bytes in %.3fs (%s MB/s)", action, bucket_name, file_name, size, duration,
+        f'{throughput:.2f}' if throughput is not None else '-',
+        extra={
+            's3_action': action, 's3_bucket': bucket_name, 's3_key': file_name, 'bytes': size,
+            'duration_s': round(duration, 3), 'throughput_mb_s': throughput,
+        },
+    )
 
 def upload_to_s3(file, bucket_name, file_name):
+    started = time.monotonic()
     try:
-        # Create an S3 client
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION,
-        )
-
-        # Upload the file to S3
-        s3.upload_fileobj(file, bucket_name, file_name)
+        s3 = get_s3_client()
+
+        # Upload the file to S3, large files go up as concurrent multipart chunks
+        s3.upload_fileobj(file, bucket_name, file_name, Config=get_transfer_config())
         
         # Generate the file URL after successful upload
-        file_url = f"https://{bucket_name}.s3.amazonaws.com/{file_name}"
-        print(f"File uploaded successfully. URL: {file_url}")
+        file_url = s3_file_url(bucket_name, file_name)
+        log_transfer('upload', bucket_name, file_name, getattr(file, 'size', None), started)
 
         return file_url
     except NoCredentialsError:
-        print("Error: AWS credentials are missing or incorrect.")
+        logger.error("S3 upload of %s failed: AWS credentials are missing or incorrect.", file_name)
         return None
-    except Exception as e:
-        print(f"Error during S3 upload: {e}")
+    except Exception:
+        logger.exception("S3 upload of %s failed", file_name)
         return None
     finally:
         if hasattr(file, 'close'):
-            file.close()
\ No newline at end of file
+            file.close()
+
+# Direct-to-S3 multipart uploads: the browser PUTs each part to a presigned url,
+# so the video bytes never pass through a Django worker.
+
+def multipart_part_size(size):
+    part_size = max(settings.AWS_UPLOAD_PART_SIZE, MIN_PART_SIZE)
+    # grow the parts for very large files so we stay under the S3 part limit
+    return max(part_size, math.ceil(size / MAX_PARTS))
+
+def start_multipart_upload(bucket_name, file_name, size, content_type):
+    s3 = get_s3_client()
+    upload = s3.create_multipart_upload(Bucket=bucket_name, Key=file_name, ContentType=content_type)
+    upload_id = upload['UploadId']
+
+    part_size = multipart_part_size(size)
+    parts = [
+        {
+            'part_number': part_number,
+            'url': s3.generate_presigned_url(
+                'upload_part',
+                Params={'Bucket': bucket_name, 'Key': file_name, 'UploadId': upload_id, 'PartNumber': part_number},
+                ExpiresIn=settings.AWS_PRESIGNED_URL_EXPIRY,
+            ),
+        }
+        for part_number in range(1, math.ceil(size / part_size) + 1)
+    ]
+    return {'upload_id': upload_id, 'key': file_name, 'part_size': part_size, 'parts': parts}
+
+def complete_multipart_upload(bucket_name, file_name, upload_id, parts):
+    s3 = get_s3_client()
+    s3.complete_multipart_upload(
+        Bucket=bucket_name,
+        Key=file_name,
+        UploadId=upload_id,
+        MultipartUpload={'Parts': [
+            {'PartNumber': part['part_number'], 'ETag': part['etag']}
+            for part in sorted(parts, key=lambda part: part['part_number'])
+        ]},
+    )
+    return s3_file_url(bucket_name, file_name)
+
+def abort_multipart_upload(bucket_name, file_name, upload_id):
+    get_s3_client().abort_multipart_upload(Bucket=bucket_name, Key=file_name, UploadId=upload_id)
@@ -0,0 +1,80 @@
+import copy
+import statistics
+import time
+
+from django.db import connections
+from django.db.utils import load_backend
+
+from courses.db.pool import DEFAULTS, PooledDatabaseWrapperMixin, get_pool
+
+# Connection overhead per request for each DB_CONNECTIONS mode. Every simulated
+# request does what Django does around a cheap view: close_old_connections on
+# request_started, one small query, close_old_connections on request_finished.
+# The difference between the modes is the cost of opening connections.
+
+MODES = ('close', 'persistent', 'pool')
+
+# the stock backend under a pooled engine, so every mode runs the same driver code
+STOCK_ENGINES = {'courses.db.mysql': 'django.db.backends.mysql'}
+
+
+def connection_for(mode, alias='default'):
+    settings_dict = copy.deepcopy(connections[alias].settings_dict)
+    settings_dict['ENGINE'] = STOCK_ENGINES.get(settings_dict['ENGINE'], settings_dict['ENGINE'])
+    settings_dict['OPTIONS'].pop('pool', None)
+    settings_dict['CONN_MAX_AGE'] = 0
+    settings_dict['CONN_HEALTH_CHECKS'] = False
+    opened = []
+
+    class CountingWrapper(load_backend(settings_dict['ENGINE']).DatabaseWrapper):
+        def get_new_connection(self, conn_params):
+            opened.append(1)
+            return super().get_new_connection(conn_params)
+
+    wrapper_class = CountingWrapper
+    if mode == 'persistent':
+        settings_dict['CONN_MAX_AGE'] = None
+        settings_dict['CONN_HEALTH_CHECKS'] = True
+    elif mode == 'pool':
+        settings_dict['OPTIONS']['pool'] = dict(DEFAULTS)
+        wrapper_class = type('PooledWrapper', (PooledDatabaseWrapperMixin, CountingWrapper), {})
+    return wrapper_class(settings_dict, alias=f'benchmark-{mode}'), opened
+
+
+def simulated_request(connection):
+    connection.close_if_unusable_or_obsolete()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    connection.close_if_unusable_or_obsolete()
+
+
+def run_mode(mode, iterations=500, alias='default'):
+    connection, opened = connection_for(mode, alias)
+    timings = []
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            simulated_request(connection)
+            timings.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+        if mode == 'pool':
+            get_pool(connection.alias, {}).close_idle()
+
+    cut_points = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return {
+        'requests': len(timings),
+        'connections_opened': len(opened),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'p50_ms': round(cut_points[49] * 1000, 3),
+        'p95_ms': round(cut_points[94] * 1000, 3),
+    }
+
+
+def run(modes=None, iterations=500, alias='default'):
+    connection = connections[alias]
+    return {
+        'meta': {'vendor': connection.vendor, 'driver': connection.Database.__name__, 'iterations': iterations},
+        'modes': {mode: run_mode(mode, iterations, alias) for mode in modes or MODES},
+    }
@@ -0,0 +1,148 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from courses.models import Course, Enrollment, Lesson, Profile, Review
+
+# Bulk generator for a realistic LMS dataset. Every row is created with bulk_create
+# in batches; the same seed always produces the same data.
+
+USERNAME_PREFIX = 'bench'
+PASSWORD = 'bench-Pass-123'
+INSTRUCTOR_SHARE = 0.02
+HISTORY_DAYS = 365
+
+DEFAULT_SIZES = {
+    'users': 100_000,
+    'courses': 10_000,
+    'lessons': 200_000,
+    'enrollments': 2_000_000,
+    'reviews': 500_000,
+}
+
+WORDS = ('python', 'django', 'design', 'data', 'marketing', 'intro', 'advanced', 'guide', 'web', 'api',
+         'testing', 'cloud', 'security', 'mobile', 'analytics', 'music', 'writing', 'finance', 'react', 'sql')
+
+
+def scaled_sizes(scale=1.0, **overrides):
+    sizes = {name: max(1, int(count * scale)) for name, count in DEFAULT_SIZES.items()}
+    sizes.update({name: count for name, count in overrides.items() if count is not None})
+    return sizes
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _max_id(model):
+    return model.objects.aggregate(m=Max('id'))['m'] or 0
+
+
+def _spread_dates(model, field, first_id, rng, now):
+    # auto_now_add overwrites bulk_create values, so backdate each new row afterwards
+    # (bulk_update writes the values as given)
+    ids = model.objects.filter(id__gt=first_id).order_by('id').values_list('id', flat=True)
+    rows = [model(id=row_id, **{field: now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 24 * 60 * 60))})
+            for row_id in ids]
+    model.objects.bulk_update(rows, [field], batch_size=1000)
+
+
+def _title(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count)).capitalize()
+
+
+def generate(sizes, seed=1, batch_size=5000, log=print):
+    rng = random.Random(seed)
+    now = timezone.now()
+    categories = [value for value, _ in Course.CATEGORY_CHOICES]
+    password = make_password(PASSWORD)  # hashed once: hashing per user would dominate the run
+
+    first_user = _max_id(User)
+    users = (User(username=f'{USERNAME_PREFIX}{i}', email=f'{USERNAME_PREFIX}{i}@example.com', password=password)
+             for i in range(sizes['users']))
+    for batch in _batches(users, batch_size):
+        User.objects.bulk_create(batch)
+    user_ids = list(User.objects.filter(id__gt=first_user).order_by('id').values_list('id', flat=True))
+    instructors = user_ids[:max(1, int(len(user_ids) * INSTRUCTOR_SHARE))]
+    students = user_ids[len(instructors):] or user_ids
+    instructor_set = set(instructors)
+    profiles = (Profile(user_id=uid, role='instructor' if uid in instructor_set else 'student') for uid in user_ids)
+    for batch in _batches(profiles, batch_size):
+        Profile.objects.bulk_create(batch)
+    log(f'users: {len(user_ids)} ({len(instructors)} instructors)')
+
+    first_course = _max_id(Course)
+    courses = (
+        Course(title=_title(rng, 3), description=_title(rng, 30), instructor_id=rng.choice(instructors),
+               price=rng.choice((0, 9.99, 19.99, 49.99, 99.99)), category=rng.choice(categories),
+               published=rng.random() < 0.9)
+        for _ in range(sizes['courses'])
+    )
+    for batch in _batches(courses, batch_size):
+        first = _max_id(Course)
+        Course.objects.bulk_create(batch)
+        _spread_dates(Course, 'created_at', first, rng, now)
+    course_ids = list(Course.objects.filter(id__gt=first_course).order_by('id').values_list('id', flat=True))
+    log(f'courses: {len(course_ids)}')
+
+    lessons = (
+        Lesson(course_id=course_ids[i % len(course_ids)], order=i // len(course_ids), title=_title(rng, 4),
+               content=_title(rng, 200))
+        for i in range(sizes['lessons'])
+    )
+    for batch in _batches(lessons, batch_size):
+        Lesson.objects.bulk_create(batch)
+    log(f'lessons: {sizes["lessons"]}')
+
+    # popularity is skewed: a few courses get most of the students
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(course_ids))))
+    per_student = max(1, min(len(course_ids), -(-sizes['enrollments'] // len(students))))  # rounded up
+    review_share = min(1.0, sizes['reviews'] / sizes['enrollments'])
+
+    def enrollment_pairs():
+        created = 0
+        for student in students:
+            chosen = set()
+            while len(chosen) < per_student:
+                chosen.update(rng.choices(course_ids, cum_weights=cum_weights, k=per_student - len(chosen)))
+            for course in sorted(chosen):
+                yield student, course
+                created += 1
+                if created == sizes['enrollments']:
+                    return
+
+    enrolled = reviewed = 0
+    for batch in _batches(enrollment_pairs(), batch_size):
+        first = _max_id(Enrollment)
+        Enrollment.objects.bulk_create([Enrollment(student_id=s, course_id=c) for s, c in batch])
+        _spread_dates(Enrollment, 'enrolled_at', first, rng, now)
+        enrolled += len(batch)
+
+        first = _max_id(Review)
+        reviews = [
+            Review(student_id=s, course_id=c, rating=rng.choices((1, 2, 3, 4, 5), (1, 1, 3, 6, 9))[0],
+                   comment=_title(rng, 12))
+            for s, c in batch if rng.random() < review_share
+        ]
+        Review.objects.bulk_create(reviews)
+        _spread_dates(Review, 'created_at', first, rng, now)
+        reviewed += len(reviews)
+    log(f'enrollments: {enrolled}, reviews: {reviewed}')
+
+
+@transaction.atomic
+def clear():
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
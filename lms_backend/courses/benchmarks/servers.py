@@ -0,0 +1,163 @@
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from . import data
+
+# Concurrency capacity of one worker: the same read endpoints served by one gunicorn
+# sync worker (WSGI, the async views off) and by one uvicorn worker (ASGI, the async
+# views on), each hit by N concurrent clients for a fixed time. Unlike the in-process
+# suite this goes over real sockets, so it needs a database both servers can reach.
+
+BASE_DIR = Path(settings.BASE_DIR)
+
+SERVERS = {
+    'wsgi': {
+        'command': ['gunicorn', 'lms_backend.wsgi:application', '--workers', '1', '--worker-class', 'sync',
+                    '--bind', '127.0.0.1:{port}', '--timeout', '120'],
+        'env': {'ASYNC_READ_VIEWS': 'false'},
+    },
+    'asgi': {
+        'command': [sys.executable, '-m', 'uvicorn', 'lms_backend.asgi:application', '--workers', '1',
+                    '--host', '127.0.0.1', '--port', '{port}', '--no-access-log'],
+        'env': {'ASYNC_READ_VIEWS': 'true'},
+    },
+}
+
+
+class ServerError(Exception):
+    pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, port, timeout=30):
+    server = SERVERS[name]
+    command = [part.format(port=port) for part in server['command']]
+    try:
+        process = subprocess.Popen(command, cwd=BASE_DIR, env={**os.environ, **server['env']},
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise ServerError(f'{command[0]} is not installed')
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise ServerError(f'{name} server exited: {process.stderr.read().decode()[-2000:]}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise ServerError(f'{name} server did not start within {timeout}s')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def request(port, path, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        conn.request('GET', path, headers={'Host': 'localhost', **(headers or {})})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def access_token(port, username):
+    body = json.dumps({'username': username, 'password': data.PASSWORD})
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        conn.request('POST', '/api/token/', body, {'Host': 'localhost', 'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        if response.status != 200:
+            raise ServerError(f'could not obtain a token for {username}: {response.status}')
+        return json.loads(response.read())['access']
+    finally:
+        conn.close()
+
+
+def targets(fixtures, token):
+    # (path, headers) pairs the clients cycle through
+    auth = {'Authorization': f'Bearer {token}'}
+    course_ids = fixtures['course_ids'][:50]
+    return (
+        [('/api/courses/', {})]
+        + [(f'/api/courses/{course_id}/', auth) for course_id in course_ids]
+        + [(f'/api/courses/{course_id}/reviews/', {}) for course_id in course_ids]
+        + [('/api/student/courses/', auth)]
+    )
+
+
+def load(port, paths, concurrency, duration):
+    timings, errors = [], []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        i = offset
+        while time.monotonic() < stop_at:
+            path, headers = paths[i % len(paths)]
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                status, _ = request(port, path, headers)
+            except OSError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                if status in (200, 304):
+                    timings.append(elapsed)
+                else:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    cut_points = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return {
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'errors': len(errors),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(cut_points[49] * 1000, 3) if cut_points else None,
+        'p95_ms': round(cut_points[94] * 1000, 3) if cut_points else None,
+    }
+
+
+def run(fixtures, servers=None, concurrency=(1, 10, 50), duration=10, warmup=2):
+    results = {}
+    for name in servers or SERVERS:
+        port = free_port()
+        process = start_server(name, port)
+        try:
+            paths = targets(fixtures, access_token(port, fixtures['student'].username))
+            load(port, paths, 1, warmup)
+            results[name] = [load(port, paths, level, duration) for level in concurrency]
+        finally:
+            stop_server(process)
+    return results
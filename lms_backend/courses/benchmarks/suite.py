@@ -0,0 +1,153 @@
+import json
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from courses.instrumentation import RequestRecord
+from courses.models import Course, Enrollment
+
+from . import data
+
+# Runs each scenario through the full middleware/view stack in-process (no network)
+# and records latency percentiles and queries per request. Results are compared with
+# a JSON baseline; a scenario regresses when its p95 grows by more than the threshold
+# or it runs more queries than before.
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def load_fixtures(rng):
+    users = data.USERNAME_PREFIX
+    course_ids = list(Course.objects.published().filter(instructor__username__startswith=users)
+                      .values_list('id', flat=True)[:1000])
+    student = (Enrollment.objects.filter(student__username__startswith=users).values('student')
+               .annotate(c=Count('id')).order_by('-c').values_list('student', flat=True).first())
+    instructor = (Course.objects.filter(instructor__username__startswith=users).values('instructor')
+                  .annotate(c=Count('id')).order_by('-c').values_list('instructor', flat=True).first())
+    if not course_ids or student is None or instructor is None:
+        raise BenchmarkError('No benchmark data found, run `manage.py generate_benchmark_data` first.')
+    return {
+        'course_ids': course_ids,
+        'student': User.objects.get(pk=student),
+        'instructor': User.objects.get(pk=instructor),
+        'rng': rng,
+    }
+
+
+def course_list(client, fixtures):
+    return client.get('/api/courses/')
+
+
+def course_detail(client, fixtures):
+    return client.get(f'/api/courses/{fixtures["rng"].choice(fixtures["course_ids"])}/')
+
+
+def student_courses(client, fixtures):
+    client.force_authenticate(fixtures['student'])
+    return client.get('/api/student/courses/')
+
+
+def instructor_stats(client, fixtures):
+    client.force_authenticate(fixtures['instructor'])
+    return client.get('/api/instructor-stats/')
+
+
+def course_search(client, fixtures):
+    # two of the generated words, so every course matches: the worst case for the index
+    return client.get('/api/courses/search/', {'q': ' '.join(fixtures['rng'].sample(data.WORDS, 2))})
+
+
+def token(client, fixtures):
+    return client.post('/api/token/', {'username': fixtures['student'].username, 'password': data.PASSWORD},
+                       format='json')
+
+
+SCENARIOS = {
+    'course-list': course_list,
+    'course-detail': course_detail,
+    'course-search': course_search,
+    'student-courses': student_courses,
+    'instructor-stats': instructor_stats,
+    'token': token,
+}
+
+
+def percentile(cut_points, p):
+    return round(cut_points[p - 1] * 1000, 3)
+
+
+def run_scenario(name, fixtures, iterations=200, warmup=10, cold=False):
+    request = SCENARIOS[name]
+    timings = []
+    queries = 0
+    for i in range(warmup + iterations):
+        client = APIClient(SERVER_NAME='localhost')
+        if cold:
+            cache.clear()
+        record = RequestRecord()
+        with connection.execute_wrapper(record):
+            start = time.perf_counter()
+            response = request(client, fixtures)
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise BenchmarkError(f'{name} returned {response.status_code}')
+        if i >= warmup:
+            timings.append(elapsed)
+            queries = max(queries, record.queries)
+
+    cut_points = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return {
+        'requests': len(timings),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'p50_ms': percentile(cut_points, 50),
+        'p95_ms': percentile(cut_points, 95),
+        'p99_ms': percentile(cut_points, 99),
+        'max_queries': queries,
+    }
+
+
+def run_suite(names=None, iterations=200, warmup=10, cold=False, seed=1):
+    fixtures = load_fixtures(random.Random(seed))
+    return {
+        'meta': {
+            'database': connection.vendor,
+            'courses': Course.objects.count(),
+            'enrollments': Enrollment.objects.count(),
+            'iterations': iterations,
+            'cold_cache': cold,
+        },
+        'scenarios': {name: run_scenario(name, fixtures, iterations, warmup, cold) for name in names or SCENARIOS},
+    }
+
+
+def regressions(results, baseline, threshold=0.2):
+    found = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        limit = previous['p95_ms'] * (1 + threshold)
+        if current['p95_ms'] > limit:
+            found.append(f'{name}: p95 {current["p95_ms"]} ms > {limit:.3f} ms (baseline {previous["p95_ms"]} ms)')
+        if current['max_queries'] > previous['max_queries']:
+            found.append(f'{name}: {current["max_queries"]} queries per request (baseline {previous["max_queries"]})')
+    return found
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_results(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,153 @@
+import csv
+import io
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from . import caching, jobs, search
+from .models import Course, Enrollment, Lesson
+
+# Bulk enrollment and course import for onboarding whole cohorts or catalogs.
+# Users are resolved and rows written in chunks, so the number of queries depends on
+# the number of chunks, not on the number of rows.
+
+CHUNK_SIZE = 1000
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# usernames/emails from an uploaded CSV: the 'username' or 'email' column when there
+# is a header, otherwise the first column
+def identifiers_from_csv(upload):
+    reader = csv.reader(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''))
+    header = next(reader, None)
+    if header is None:
+        return []
+    names = [name.strip().lower() for name in header]
+    column = next((names.index(name) for name in ('username', 'email') if name in names), None)
+    rows = [] if column is not None else [header]
+    rows.extend(reader)
+    column = column or 0
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+
+def resolve_users(identifiers):
+    # {identifier: (user_id, role)} for every username or email that matches a user
+    # (a username wins over another user's email)
+    found, by_email = {}, {}
+    for chunk in _chunks(sorted(set(identifiers))):
+        users = (User.objects.filter(Q(username__in=chunk) | Q(email__in=chunk))
+                 .values_list('id', 'username', 'email', 'profile__role'))
+        for user_id, username, email, role in users:
+            found[username] = (user_id, role)
+            if email:
+                by_email.setdefault(email, (user_id, role))
+    return {**by_email, **found}
+
+
+def bulk_enroll(course, identifiers):
+    users = resolve_users(identifiers)
+    results, to_enroll, seen = [], {}, set()
+    for row, identifier in enumerate(identifiers, start=1):
+        match = users.get(identifier)
+        if match is None:
+            status = 'not_found'
+        elif match[1] != 'student':
+            status = 'not_a_student'
+        elif match[0] in seen:
+            status = 'duplicate'
+        else:
+            status = 'enrolled'
+            seen.add(match[0])
+            to_enroll[match[0]] = len(results)
+        results.append({'row': row, 'value': identifier, 'status': status})
+
+    created = 0
+    with transaction.atomic():
+        student_ids = list(to_enroll)
+        for chunk in _chunks(student_ids):
+            existing = set(Enrollment.objects.filter(course=course, student_id__in=chunk)
+                           .values_list('student_id', flat=True))
+            for student_id in existing:
+                results[to_enroll[student_id]]['status'] = 'already_enrolled'
+            new = [Enrollment(course=course, student_id=student_id) for student_id in chunk if student_id not in existing]
+            if not new:
+                continue
+            # the unique (student, course) constraint skips rows enrolled concurrently (the
+            # check above takes no lock). Ours are the rows carrying the enrolled_at that
+            # bulk_create stamped on our instances.
+            Enrollment.objects.bulk_create(new, ignore_conflicts=True)
+            stamps = {enrollment.student_id: enrollment.enrolled_at for enrollment in new}
+            inserted = {
+                student_id
+                for student_id, enrolled_at in Enrollment.objects.filter(course=course, student_id__in=list(stamps))
+                .values_list('student_id', 'enrolled_at')
+                if enrolled_at == stamps[student_id]
+            }
+            for student_id in stamps.keys() - inserted:
+                results[to_enroll[student_id]]['status'] = 'already_enrolled'
+            created += len(inserted)
+        if created:
+            Course.objects.filter(pk=course.pk).update(enrollment_count=F('enrollment_count') + created)
+            # bulk_create sends no post_save
+            caching.invalidate_enrollments(student_ids)
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return {'summary': summary, 'results': results}
+
+
+# MySQL does not return the new ids from a bulk insert: read them back in one query.
+# bulk_create stamped created_at on every instance, so our rows are the instructor's
+# courses in that range, matched by (created_at, title) in insert order.
+def _read_back_ids(instructor_id, courses):
+    stamps = [course.created_at for course in courses]
+    rows = (Course.objects.filter(instructor_id=instructor_id, created_at__range=(min(stamps), max(stamps)))
+            .order_by('id').values_list('id', 'created_at', 'title'))
+    ids = {}
+    for course_id, created_at, title in rows:
+        ids.setdefault((created_at, title), []).append(course_id)
+    for course in courses:
+        course.id = ids[(course.created_at, course.title)].pop(0)
+
+
+# create courses with their lessons from validated CourseImportSerializer data
+@transaction.atomic
+def import_courses(instructor_id, courses_data):
+    courses = []
+    lessons_by_course = []
+    for course_data in courses_data:
+        course_data = dict(course_data)
+        lessons_by_course.append(course_data.pop('lessons', []))
+        courses.append(Course(instructor_id=instructor_id, **course_data))
+
+    for chunk in _chunks(courses):
+        Course.objects.bulk_create(chunk)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            _read_back_ids(instructor_id, chunk)
+
+    lessons = [
+        Lesson(course=course, order=position, video_status='pending' if lesson_data.get('video_url') else 'none',
+               **lesson_data)
+        for course, lessons_data in zip(courses, lessons_by_course)
+        for position, lesson_data in enumerate(lessons_data)
+    ]
+    Lesson.objects.bulk_create(lessons, batch_size=CHUNK_SIZE)
+    # bulk_create sends no post_save, and on MySQL the lessons have no ids yet
+    search.index_courses(courses)
+    search.index_lessons(Lesson.objects.filter(course__in=courses).only('id', 'course_id', 'title', 'content'))
+
+    # video metadata is recorded by the media worker, as for single uploads
+    videos = list(Lesson.objects.filter(course__in=courses, video_status='pending').values_list('id', flat=True))
+    if videos:
+        jobs.enqueue_many('lesson_video', videos)
+    caching.invalidate_catalog()
+    return [
+        {'id': course.id, 'title': course.title, 'lessons': len(lessons_data)}
+        for course, lessons_data in zip(courses, lessons_by_course)
+    ]
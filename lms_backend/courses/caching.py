@@ -0,0 +1,187 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .db.routers import reading_from_replica
+
+# Cached course detail payloads and catalog pages.
+#
+# Course detail is stored once per course: it only carries the lesson outline, which
+# is the same for every user (lesson bodies have their own endpoint). Catalog pages are keyed by
+# the full request url plus a catalog version, so any course change retires all
+# catalog pages at once by bumping the version.
+#
+# Each user's enrolled course ids are cached the same way, under a per-user version
+# that enrolling bumps. Course payloads embed the course's recommendations, so they
+# are keyed by the recommendations version, which every rebuild bumps; a course that
+# is renamed, unpublished or deleted retires the payloads recommending it (see
+# models.touch_recommending_courses).
+#
+# With read replicas, a change also leaves a marker for REPLICA_STICKY_SECONDS, and
+# data read from a replica is not cached while the marker is there: the replica may
+# not have the change yet, and the stale copy would outlive the lag in the cache.
+
+CATALOG_VERSION_KEY = 'catalog:version'
+RECOMMENDATIONS_VERSION_KEY = 'recommendations:version'
+STATS_KEYS = {True: 'cache-stats:hits', False: 'cache-stats:misses'}
+
+
+def course_detail_key(course_id):
+    return f'course:{course_id}:{recommendations_version()}'
+
+
+def changed_key(name):
+    return f'changed:{name}'
+
+
+def mark_changed(*names):
+    if not settings.REPLICA_DATABASES:
+        return
+    # set again on commit, the replicas can only start copying the change then
+    def mark():
+        cache.set_many({changed_key(name): 1 for name in names}, settings.REPLICA_STICKY_SECONDS)
+    mark()
+    transaction.on_commit(mark)
+
+
+def may_cache(*names):
+    return not reading_from_replica() or not cache.get_many([changed_key(name) for name in names])
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # start from the clock so an evicted version never brings back old entries
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def catalog_version():
+    return _version(CATALOG_VERSION_KEY)
+
+
+def recommendations_version():
+    return _version(RECOMMENDATIONS_VERSION_KEY)
+
+
+def enrollment_version_key(user_id):
+    return f'enrollments:version:{user_id}'
+
+
+def _enrollment_set_key(user_id):
+    # read the version before the database, so a set loaded while an enrollment commits
+    # is stored under the version that enrollment retires
+    if not settings.ENROLLMENT_CACHE_TIMEOUT:
+        return None
+    return f'enrollments:{user_id}:{_version(enrollment_version_key(user_id))}'
+
+
+def _enrollment_rows(user_id):
+    from .models import Enrollment  # models imports this module
+    return Enrollment.objects.filter(student_id=user_id).values_list('course_id', flat=True)
+
+
+def enrolled_course_ids(user_id):
+    key = _enrollment_set_key(user_id)
+    course_ids = cache.get(key) if key else None
+    if course_ids is None:
+        course_ids = frozenset(_enrollment_rows(user_id))
+        if key and may_cache(f'enrollments:{user_id}'):
+            cache.set(key, course_ids, settings.ENROLLMENT_CACHE_TIMEOUT)
+    return course_ids
+
+
+async def aenrolled_course_ids(user_id):
+    key = _enrollment_set_key(user_id)
+    course_ids = cache.get(key) if key else None
+    if course_ids is None:
+        course_ids = frozenset([course_id async for course_id in _enrollment_rows(user_id)])
+        if key and may_cache(f'enrollments:{user_id}'):
+            cache.set(key, course_ids, settings.ENROLLMENT_CACHE_TIMEOUT)
+    return course_ids
+
+
+def invalidate_enrollments(user_ids):
+    # bump now and again after commit: a set read while the transaction was still open
+    # would otherwise be cached under the new version
+    def bump():
+        versions = {enrollment_version_key(user_id): time.time_ns() for user_id in user_ids}
+        cache.set_many(versions, timeout=None)
+    bump()
+    transaction.on_commit(bump)
+    mark_changed(*(f'enrollments:{user_id}' for user_id in user_ids))
+
+
+def catalog_page_key(request):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'catalog:{catalog_version()}:{url}'
+
+
+def incr_counter(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:  # key missing or evicted
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def get_cached(key):
+    value = cache.get(key)
+    incr_counter(STATS_KEYS[value is not None])
+    return value
+
+
+def set_course_detail(course_id, instructor_id, data):
+    if not may_cache(f'course:{course_id}'):
+        return
+    cache.set(course_detail_key(course_id), {'instructor_id': instructor_id, 'data': data},
+              settings.COURSE_CACHE_TIMEOUT)
+
+
+def set_catalog_page(key, data):
+    if not may_cache('catalog'):
+        return
+    cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+
+
+def invalidate_course(course_id):
+    cache.delete(course_detail_key(course_id))
+    mark_changed(f'course:{course_id}')
+    invalidate_catalog()
+
+
+def invalidate_course_details(course_ids):
+    # only the detail payloads, for changes the catalog pages don't show
+    cache.delete_many([course_detail_key(course_id) for course_id in course_ids])
+    mark_changed(*(f'course:{course_id}' for course_id in course_ids))
+
+
+def invalidate_catalog():
+    mark_changed('catalog')
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        catalog_version()
+
+
+def invalidate_recommendations():
+    try:
+        cache.incr(RECOMMENDATIONS_VERSION_KEY)
+    except ValueError:
+        recommendations_version()
+
+
+def cache_stats():
+    hits = cache.get(STATS_KEYS[True], 0)
+    misses = cache.get(STATS_KEYS[False], 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+        'backend': settings.CACHES['default']['BACKEND'],
+    }
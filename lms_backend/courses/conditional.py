@@ -0,0 +1,165 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from . import caching
+from .models import Course, Profile, Review
+
+# ETag / Last-Modified functions for conditional GETs.
+#
+# Each function reads only cheap metadata (an updated_at stamp or an aggregate over an
+# index), so a request carrying If-None-Match / If-Modified-Since is answered with 304
+# before any serializer runs. The ETag also encodes which variant of the payload the
+# user gets, e.g. whether they are enrolled in the course.
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _course_meta_query(course_id):
+    return Course.objects.filter(id=course_id).values(
+        'updated_at', 'published', 'instructor_id', 'instructor__profile__updated_at'
+    )
+
+
+def _newest_change(meta):
+    if meta is not None:
+        # the payload embeds the instructor's public profile
+        profile_updated_at = meta.pop('instructor__profile__updated_at')
+        if profile_updated_at and profile_updated_at > meta['updated_at']:
+            meta['updated_at'] = profile_updated_at
+    return meta
+
+
+def course_meta(request, course_id):
+    # memoized on the request, the ETag and Last-Modified functions both need it
+    if not hasattr(request, '_course_meta'):
+        request._course_meta = _newest_change(_course_meta_query(course_id).first())
+    return request._course_meta
+
+
+def enrolled_course_ids(request):
+    # loaded once per request (and cached across requests, see caching.enrolled_course_ids)
+    if not hasattr(request, '_enrolled_course_ids'):
+        user = request.user
+        request._enrolled_course_ids = (
+            caching.enrolled_course_ids(user.id) if user.is_authenticated else frozenset()
+        )
+    return request._enrolled_course_ids
+
+
+async def aenrolled_course_ids(request):
+    if not hasattr(request, '_enrolled_course_ids'):
+        user = request.user
+        request._enrolled_course_ids = (
+            await caching.aenrolled_course_ids(user.id) if user.is_authenticated else frozenset()
+        )
+    return request._enrolled_course_ids
+
+
+def is_enrolled(request, course_id):
+    return int(course_id) in enrolled_course_ids(request)
+
+
+def course_variant(request, course_id, meta):
+    user = request.user
+    if not user.is_authenticated:
+        return 'anonymous'
+    if meta['instructor_id'] == user.id:
+        return 'instructor'
+    if is_enrolled(request, course_id):
+        return 'enrolled'
+    return 'anonymous'
+
+
+def course_detail_etag(request, course_id):
+    meta = course_meta(request, course_id)
+    if meta is None:
+        return None
+    return make_etag('course', course_id, meta['updated_at'].isoformat(), course_variant(request, course_id, meta),
+                     caching.recommendations_version())
+
+
+def course_detail_last_modified(request, course_id):
+    meta = course_meta(request, course_id)
+    return meta['updated_at'] if meta else None
+
+
+# reviews embed each reviewer's public profile, so a profile change is a change too
+REVIEW_STATS = {'count': Count('id'), 'last_id': Max('id'), 'last_created': Max('created_at'),
+                'last_profile_change': Max('student__profile__updated_at')}
+
+
+def review_stats(request, course_id):
+    if not hasattr(request, '_review_stats'):
+        request._review_stats = Review.objects.filter(course_id=course_id).aggregate(**REVIEW_STATS)
+    return request._review_stats
+
+
+def course_reviews_etag(request, course_id):
+    stats = review_stats(request, course_id)
+    last_profile_change = stats['last_profile_change']
+    return make_etag('reviews', course_id, stats['count'], stats['last_id'],
+                     last_profile_change.isoformat() if last_profile_change else '')
+
+
+def course_reviews_last_modified(request, course_id):
+    stats = review_stats(request, course_id)
+    changes = [stats['last_created'], stats['last_profile_change']]
+    return max((change for change in changes if change), default=None)
+
+
+def profile_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    updated_at = Profile.objects.filter(user=request.user).values_list('updated_at', flat=True).first()
+    return make_etag('profile', request.user.id, updated_at.isoformat() if updated_at else '')
+
+
+course_detail_condition = method_decorator(
+    condition(etag_func=course_detail_etag, last_modified_func=course_detail_last_modified)
+)
+course_reviews_condition = method_decorator(
+    condition(etag_func=course_reviews_etag, last_modified_func=course_reviews_last_modified)
+)
+profile_condition = method_decorator(condition(etag_func=profile_etag))
+
+
+# The async read views (courses/async_views.py) load the memoized values above with
+# the async ORM first; the same ETag functions then run without touching the database.
+
+async def prepare_course_detail(request, course_id):
+    if not hasattr(request, '_course_meta'):
+        request._course_meta = _newest_change(await _course_meta_query(course_id).afirst())
+    await aenrolled_course_ids(request)
+
+
+async def prepare_course_reviews(request, course_id):
+    if not hasattr(request, '_review_stats'):
+        request._review_stats = await Review.objects.filter(course_id=course_id).aaggregate(**REVIEW_STATS)
+
+
+def async_condition(prepare, etag_func, last_modified_func):
+    conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+    def decorator(view):
+        view = conditional(view)
+
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            await prepare(request, *args, **kwargs)
+            return await view(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+async_course_detail_condition = async_condition(
+    prepare_course_detail, course_detail_etag, course_detail_last_modified
+)
+async_course_reviews_condition = async_condition(
+    prepare_course_reviews, course_reviews_etag, course_reviews_last_modified
+)
@@ -0,0 +1,9 @@
+from django.db.backends.mysql import base
+
+from courses.db.pool import PooledDatabaseWrapperMixin
+
+
+# django.db.backends.mysql with the connection pool from courses/db/pool.py,
+# configured with OPTIONS['pool']
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
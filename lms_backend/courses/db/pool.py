@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from functools import partial
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError
+
+# Connection pool for database backends without one of their own (MySQL).
+#
+# Enabled per database with OPTIONS['pool'] (True or a dict of the options below), as
+# for Django's PostgreSQL pool. Django still "closes" the connection at the end of
+# every request (CONN_MAX_AGE = 0); the pooled wrapper hands the open connection
+# back to the pool instead, and the next request in any thread of the process takes
+# it without a new TCP and auth handshake.
+#
+# Connections idle for more than check_after seconds are pinged before reuse, and
+# replaced after max_lifetime seconds, well before MySQL's wait_timeout drops them.
+# At most max_size connections are open per process; a request that finds them all
+# busy waits up to timeout seconds and then fails with PoolTimeout.
+
+DEFAULTS = {'max_size': 10, 'timeout': 10.0, 'max_lifetime': 1800.0, 'check_after': 30.0}
+STATS = ('checkouts', 'waits', 'wait_us', 'timeouts', 'opened', 'closed')
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class PooledConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = self.released_at = time.monotonic()
+
+
+class ConnectionPool:
+    def __init__(self, check=None, max_size=10, timeout=10.0, max_lifetime=1800.0, check_after=30.0):
+        self.check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.available = threading.Condition()
+        self.idle = deque()
+        self.in_use = {}  # id(connection) -> PooledConnection
+        self.size = 0  # idle + in use + being opened
+        self.stats = Counter()
+
+    def acquire(self, connect):
+        start = time.monotonic()
+        waited = False
+        while True:
+            with self.available:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(f'no database connection free within {self.timeout}s '
+                                          f'({self.max_size} in use)')
+                    waited = True
+                    self.available.wait(remaining)
+                # the most recently used connection is the least likely to have gone stale
+                entry = self.idle.pop() if self.idle else None
+                if entry is None:
+                    self.size += 1  # reserve the slot, connect outside the lock
+            if entry is None:
+                entry = self._open(connect)
+            elif not self._healthy(entry):
+                self._close(entry)
+                continue
+            with self.available:
+                self.in_use[id(entry.connection)] = entry
+                self.stats['checkouts'] += 1
+                if waited:
+                    self.stats['waits'] += 1
+                    self.stats['wait_us'] += int((time.monotonic() - start) * 1e6)
+            return entry.connection
+
+    def release(self, connection):
+        with self.available:
+            entry = self.in_use.pop(id(connection), None)
+            if entry is None:  # opened by another pool, e.g. before a fork
+                connection.close()
+                return
+            entry.released_at = time.monotonic()
+            if entry.released_at - entry.created_at < self.max_lifetime:
+                self.idle.append(entry)
+                self.available.notify()
+                return
+        self._close(entry)
+
+    def discard(self, connection):
+        with self.available:
+            entry = self.in_use.pop(id(connection), None)
+        self._close(entry or PooledConnection(connection), counted=entry is not None)
+
+    def close_idle(self):
+        with self.available:
+            entries, self.idle = list(self.idle), deque()
+        for entry in entries:
+            self._close(entry)
+
+    def take_stats(self):
+        with self.available:
+            stats, self.stats = self.stats, Counter()
+        return stats
+
+    def _open(self, connect):
+        try:
+            entry = PooledConnection(connect())
+        except BaseException:
+            with self.available:
+                self.size -= 1
+                self.available.notify()
+            raise
+        with self.available:
+            self.stats['opened'] += 1
+        return entry
+
+    def _healthy(self, entry):
+        now = time.monotonic()
+        if now - entry.created_at >= self.max_lifetime:
+            return False
+        if self.check is None or now - entry.released_at < self.check_after:
+            return True
+        try:
+            self.check(entry.connection)
+        except Exception:
+            return False
+        return True
+
+    def _close(self, entry, counted=True):
+        try:
+            entry.connection.close()
+        except Exception:
+            pass  # already broken, which is often why it is being closed
+        if not counted:
+            return
+        with self.available:
+            self.size -= 1
+            self.stats['closed'] += 1
+            self.available.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options, check=None):
+    # one pool per database alias and process: a forked worker must not share the
+    # parent's sockets
+    key = (os.getpid(), alias)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                unknown = set(options) - set(DEFAULTS)
+                if unknown:
+                    raise ImproperlyConfigured(f'Unknown pool options for {alias}: {", ".join(sorted(unknown))}')
+                pool = _pools[key] = ConnectionPool(check, **{**DEFAULTS, **options})
+    return pool
+
+
+def pools():
+    pid = os.getpid()
+    return {alias: pool for (owner, alias), pool in list(_pools.items()) if owner == pid}
+
+
+def check_connection(connection):
+    ping = getattr(connection, 'ping', None)
+    if ping is not None:
+        ping()  # MySQL: a protocol-level ping, no query
+    else:
+        cursor = connection.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+
+
+class PooledDatabaseWrapperMixin:
+    # mixed into a backend's DatabaseWrapper, see courses/db/mysql/base.py
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured('Pooling does not support persistent connections (set CONN_MAX_AGE = 0).')
+        return get_pool(self.alias, options if isinstance(options, dict) else {}, check_connection)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)  # not a driver argument
+        return params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        return pool.acquire(partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection, self.connection = self.connection, None
+        with self.wrap_database_errors:
+            if self.in_atomic_block or not self.autocommit or self.errors_occurred:
+                # hand back no open transaction, and no connection that cannot roll back
+                try:
+                    connection.rollback()
+                except self.Database.Error:
+                    pool.discard(connection)
+                    return
+            pool.release(connection)
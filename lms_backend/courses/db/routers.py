@@ -0,0 +1,143 @@
+import contextvars
+import random
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# Read replicas for the read-heavy endpoints.
+#
+# Only views decorated with @replica_reads (catalog, course detail, review list,
+# enrolled courses) read from a replica, and only for GET/HEAD; everything else,
+# and every write, uses the primary. The replica is picked per request from
+# settings.REPLICA_DATABASES, so one response never mixes two replicas.
+#
+# Read-your-writes: ReplicaRoutingMiddleware notices requests that wrote to the
+# database and keeps that user on the primary for REPLICA_STICKY_SECONDS, which
+# should be longer than the replication lag. Within a request, reads after a write
+# go to the primary as well.
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class RoutingState:
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('db_routing', default=None)
+
+
+def sticky_key(user_id):
+    return f'replica-sticky:{user_id}'
+
+
+def reading_from_replica():
+    state = _state.get()
+    return state is not None and state.replica is not None and not state.wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.replica is not None and not state.wrote:
+            return state.replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # always the primary, also for instances that were read from a replica
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+def choose_replica(request):
+    if not settings.REPLICA_DATABASES or request.method not in SAFE_METHODS:
+        return None
+    user = request.user
+    if user.is_authenticated and cache.get(sticky_key(user.id)):
+        return None
+    return random.choice(settings.REPLICA_DATABASES)
+
+
+@contextmanager
+def replica_scope(request):
+    state = _state.get()
+    token = None
+    if state is None:  # outside ReplicaRoutingMiddleware, e.g. a view called directly
+        state = RoutingState()
+        token = _state.set(state)
+    state.replica = choose_replica(request)
+    try:
+        yield
+    finally:
+        state.replica = None
+        if token is not None:
+            _state.reset(token)
+
+
+# for views whose GET only reads; needs request.user, so on DRF views it goes on the
+# handler method (method_decorator) rather than on dispatch
+def replica_reads(view):
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            with replica_scope(request):
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            with replica_scope(request):
+                return view(request, *args, **kwargs)
+    return inner
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            self.stick_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            # request.user may still be the lazy session user, which loads from the database
+            await sync_to_async(self.stick_to_primary)(request)
+        return response
+
+    def stick_to_primary(self, request):
+        user = getattr(request, 'user', None)
+        if settings.REPLICA_DATABASES and user is not None and user.is_authenticated:
+            cache.set(sticky_key(user.id), 1, settings.REPLICA_STICKY_SECONDS)
@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .analytics import day_start
+from .models import Enrollment, Review
+
+# Streaming CSV / NDJSON exports for instructors.
+#
+# Rows are read in keyset batches (id > last id) with values_list and written out a
+# batch at a time, so only one batch is in memory whatever the size of the course.
+# Plain .iterator(chunk_size=...) is not enough for that on MySQL: the driver buffers
+# the whole result set in the client.
+
+CHUNK_SIZE = 2000
+OUTPUTS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# name -> model, date field for ?since/?until and (column, lookup) pairs
+EXPORTS = {
+    'roster': {
+        'model': Enrollment,
+        'date_field': 'enrolled_at',
+        'columns': [('username', 'student__username'), ('email', 'student__email'),
+                    ('first_name', 'student__first_name'), ('last_name', 'student__last_name'),
+                    ('enrolled_at', 'enrolled_at')],
+    },
+    'reviews': {
+        'model': Review,
+        'date_field': 'created_at',
+        'columns': [('username', 'student__username'), ('rating', 'rating'), ('comment', 'comment'),
+                    ('created_at', 'created_at')],
+    },
+    'enrollments': {
+        'model': Enrollment,
+        'date_field': 'enrolled_at',
+        'columns': [('course_id', 'course_id'), ('course', 'course__title'), ('username', 'student__username'),
+                    ('email', 'student__email'), ('enrolled_at', 'enrolled_at')],
+    },
+}
+
+
+def parse_date_range(since, until):
+    # inclusive ISO dates -> aware [start, end) bounds; raises ValueError on bad input
+    start = day_start(date.fromisoformat(since)) if since else None
+    end = day_start(date.fromisoformat(until) + timedelta(days=1)) if until else None
+    return start, end
+
+
+def export_queryset(name, start=None, end=None, **filters):
+    export = EXPORTS[name]
+    queryset = export['model'].objects.filter(**filters)
+    if start:
+        queryset = queryset.filter(**{f'{export["date_field"]}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{export["date_field"]}__lt': end})
+    return queryset
+
+
+def _batch(queryset, lookups, last_id, chunk_size):
+    return queryset.filter(id__gt=last_id).order_by('id').values_list('id', *lookups)[:chunk_size]
+
+
+def iter_batches(queryset, lookups, chunk_size=None):
+    chunk_size = chunk_size or CHUNK_SIZE
+    last_id = 0
+    while True:
+        batch = list(_batch(queryset, lookups, last_id, chunk_size))
+        if batch:
+            yield [row[1:] for row in batch]
+        if len(batch) < chunk_size:
+            return
+        last_id = batch[-1][0]
+
+
+# the same with the async ORM: under ASGI Django would read a sync iterator into memory
+async def aiter_batches(queryset, lookups, chunk_size=None):
+    chunk_size = chunk_size or CHUNK_SIZE
+    last_id = 0
+    while True:
+        batch = [row async for row in _batch(queryset, lookups, last_id, chunk_size)]
+        if batch:
+            yield [row[1:] for row in batch]
+        if len(batch) < chunk_size:
+            return
+        last_id = batch[-1][0]
+
+
+def safe_cell(value):
+    # stop spreadsheet apps from running student-written text as a formula
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def csv_text(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([safe_cell(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def ndjson_text(header, rows):
+    return ''.join(json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+
+
+def text_chunks(output, header, batches):
+    if output == 'csv':
+        yield csv_text([header])
+    for rows in batches:
+        yield csv_text(rows) if output == 'csv' else ndjson_text(header, rows)
+
+
+async def atext_chunks(output, header, batches):
+    if output == 'csv':
+        yield csv_text([header])
+    async for rows in batches:
+        yield csv_text(rows) if output == 'csv' else ndjson_text(header, rows)
+
+
+def stream_export(name, queryset, output, filename):
+    columns = EXPORTS[name]['columns']
+    header = [column for column, _ in columns]
+    lookups = [lookup for _, lookup in columns]
+    if settings.ASYNC_READ_VIEWS:
+        chunks = atext_chunks(output, header, aiter_batches(queryset, lookups))
+    else:
+        chunks = text_chunks(output, header, iter_batches(queryset, lookups))
+    response = StreamingHttpResponse(chunks, content_type=OUTPUTS[output])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{output}"'
+    return response
@@ -0,0 +1,89 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, models
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+# MySQL full text search: MATCH (title, description) AGAINST (query)
+# needs the FULLTEXT index created in migration 0004
+class MatchAgainst(models.Func):
+    output_field = models.FloatField()
+
+    def __init__(self, *expressions, query):
+        super().__init__(*expressions)
+        self.query = query
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(compiler, connection, template='MATCH (%(expressions)s)', **extra_context)
+        return f'{sql} AGAINST (%s IN NATURAL LANGUAGE MODE)', [*params, self.query]
+
+
+def parse_price(request, name):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: 'A valid number is required.'})
+
+
+# filters for the course catalog:
+# ?category=design&min_price=0&max_price=50&instructor=3&search=python
+class CourseCatalogFilter(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        category = params.get('category')
+        if category and category != 'all':
+            queryset = queryset.filter(category=category)
+
+        min_price = parse_price(request, 'min_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        max_price = parse_price(request, 'max_price')
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+
+        instructor = params.get('instructor')
+        if instructor:
+            if not instructor.isdigit():
+                raise ValidationError({'instructor': 'A valid instructor id is required.'})
+            queryset = queryset.filter(instructor_id=instructor)
+
+        search = params.get('search', '').strip()
+        if search:
+            if connections[queryset.db].vendor == 'mysql':
+                queryset = queryset.annotate(
+                    relevance=MatchAgainst('title', 'description', query=search)
+                ).filter(relevance__gt=0)
+            else:
+                queryset = queryset.filter(Q(title__icontains=search) | Q(description__icontains=search))
+        return queryset
+
+
+# ?ordering=price, -price, rating, -rating, created_at, -created_at (default newest first)
+class CourseOrderingFilter(OrderingFilter):
+    ordering_fields = ['price', 'rating', 'created_at']
+    ordering = ['-created_at', '-id']
+
+    def get_default_ordering(self, view):
+        return self.ordering
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        # ratings are annotated as rating_score (0 for unrated courses, cursors can't hold NULL)
+        ordering = [term.replace('rating', 'rating_score') for term in ordering]
+        # the id makes every cursor position unique, however many courses share a price or rating
+        if ordering[-1].lstrip('-') != 'id':
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return ordering
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if any(term.lstrip('-') == 'rating_score' for term in ordering):
+            queryset = queryset.annotate(rating_score=Coalesce('average_rating', 0.0))
+        return queryset.order_by(*ordering)
@@ -0,0 +1,292 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .caching import incr_counter
+from .db.pool import STATS as POOL_STATS, pools
+
+# Per-request metrics: wall time, serializer time, DB query count/time and repeated
+# (N+1 style) queries, grouped by url name, method and status.
+#
+# Each process sums its requests in memory and adds them to counters in the shared
+# cache every REQUEST_METRICS_FLUSH_INTERVAL seconds, so the metrics endpoint reports
+# all workers no matter which one serves the scrape.
+
+logger = logging.getLogger(__name__)
+
+SERIES_KEY = 'request-metrics:series'
+POOLS_KEY = 'request-metrics:pools'
+DURATION_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FIELDS = ('requests', 'duration_us', 'serializer_us', 'db_queries', 'db_time_us', 'duplicate_queries') + tuple(
+    f'bucket_{le}' for le in DURATION_BUCKETS
+)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestRecord:
+    def __init__(self):
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = {}  # sql -> [count, seconds]
+
+    # connection.execute_wrapper hook
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            stats = self.statements.setdefault(sql, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def duplicates(self):
+        threshold = settings.REQUEST_METRICS_DUPLICATE_THRESHOLD
+        return {sql: count for sql, (count, _) in self.statements.items() if count >= threshold}
+
+    def slowest(self, limit=5):
+        return sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+
+
+# Installed on every connection when it opens and reports to the record of the current
+# request. The record is found through a context variable rather than by wrapping the
+# connections per request: under ASGI the async ORM runs its queries in a worker thread
+# on that thread's own connection, but the context (and so the record) goes with it.
+def record_query(execute, sql, params, many, context):
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    return record(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:  # reconnects reuse the wrapper object
+        connection.execute_wrappers.append(record_query)
+
+
+# time spent turning model instances into data; nested serializers are counted once
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        record = _current.get()
+        if record is None:
+            return super().to_representation(instance)
+        record.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            record.serializer_depth -= 1
+            if not record.serializer_depth:
+                record.serializer_time += time.perf_counter() - start
+
+
+class MetricsBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.last_flush = time.monotonic()
+
+    def add(self, labels, duration, record, duplicated):
+        values = {
+            'requests': 1,
+            'duration_us': int(duration * 1e6),
+            'serializer_us': int(record.serializer_time * 1e6),
+            'db_queries': record.queries,
+            'db_time_us': int(record.db_time * 1e6),
+            'duplicate_queries': int(duplicated),
+        }
+        bucket = next((le for le in DURATION_BUCKETS if duration <= le), None)
+        if bucket is not None:
+            values[f'bucket_{bucket}'] = 1
+        with self.lock:
+            self.series.setdefault(labels, Counter()).update(values)
+            due = time.monotonic() - self.last_flush >= settings.REQUEST_METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            series, self.series = self.series, {}
+            self.last_flush = time.monotonic()
+        flush_pool_stats()
+        if not series:
+            return
+        for labels, values in series.items():
+            for field, value in values.items():
+                if value:
+                    incr_counter(metric_key(labels, field), value)
+        known = cache.get(SERIES_KEY, set())
+        if not known.issuperset(series):
+            cache.set(SERIES_KEY, known | set(series), timeout=None)
+
+    def clear(self):
+        with self.lock:
+            self.series = {}
+
+
+buffer = MetricsBuffer()
+
+
+def metric_key(labels, field):
+    return 'request-metrics:' + ':'.join(labels) + f':{field}'
+
+
+def pool_metric_key(alias, field):
+    return f'request-metrics:pool:{alias}:{field}'
+
+
+# connection pool counters (courses/db/pool.py), flushed with the request metrics
+def flush_pool_stats():
+    flushed = set()
+    for alias, pool in pools().items():
+        for field, value in pool.take_stats().items():
+            if value:
+                incr_counter(pool_metric_key(alias, field), value)
+        flushed.add(alias)
+    known = cache.get(POOLS_KEY, set())
+    if not known.issuperset(flushed):
+        cache.set(POOLS_KEY, known | flushed, timeout=None)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.route or match.view_name
+
+
+class RequestMetricsMiddleware:
+    # runs natively in both modes, so ASGI requests never pay a thread hop for it
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        record = RequestRecord()
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, record, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        record = RequestRecord()
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, record, time.perf_counter() - start)
+
+    def record(self, request, response, record, duration):
+        labels = (view_name(request), request.method, str(response.status_code))
+        duplicates = record.duplicates()
+        buffer.add(labels, duration, record, bool(duplicates))
+        if duplicates:
+            logger.warning('repeated queries in %s %s', request.method, labels[0], extra={
+                'path': request.path,
+                'duplicates': {sql[:200]: count for sql, count in duplicates.items()},
+            })
+        slow_ms = settings.REQUEST_METRICS_SLOW_MS
+        if slow_ms and duration * 1000 >= slow_ms:
+            logger.warning('slow request %s %s took %.0f ms (%d queries, %.0f ms in db)',
+                           request.method, request.path, duration * 1000, record.queries, record.db_time * 1000,
+                           extra={'view': labels[0], 'top_queries': [
+                               {'sql': sql[:500], 'count': count, 'ms': round(seconds * 1000, 2)}
+                               for sql, (count, seconds) in record.slowest()
+                           ]})
+        return response
+
+
+POOL_COUNTERS = (
+    ('lms_db_pool_checkouts_total', 'checkouts', 'Connections taken from the pool.'),
+    ('lms_db_pool_waits_total', 'waits', 'Checkouts that had to wait for a free connection.'),
+    ('lms_db_pool_timeouts_total', 'timeouts', 'Checkouts that gave up waiting (PoolTimeout).'),
+    ('lms_db_pool_connections_opened_total', 'opened', 'Database connections opened by the pool.'),
+    ('lms_db_pool_connections_closed_total', 'closed', 'Pooled connections closed as expired or broken.'),
+)
+
+
+def _format_labels(labels, **extra):
+    view, method, status = labels
+    pairs = {'view': view, 'method': method, 'status': status, **extra}
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs.items()) + '}'
+
+
+# all series in the Prometheus text exposition format
+def prometheus_metrics():
+    buffer.flush()
+    series = sorted(cache.get(SERIES_KEY, set()))
+    keys = [metric_key(labels, field) for labels in series for field in FIELDS]
+    stored = cache.get_many(keys)
+    values = {labels: {field: stored.get(metric_key(labels, field), 0) for field in FIELDS} for labels in series}
+
+    lines = []
+
+    def metric(name, kind, help_text, rows):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(rows)
+
+    metric('lms_http_requests_total', 'counter', 'Requests by url name, method and status.', [
+        f'lms_http_requests_total{_format_labels(labels)} {v["requests"]}' for labels, v in values.items()
+    ])
+    rows = []
+    for labels, v in values.items():
+        cumulative = 0
+        for le in DURATION_BUCKETS:
+            cumulative += v[f'bucket_{le}']
+            rows.append(f'lms_http_request_duration_seconds_bucket{_format_labels(labels, le=le)} {cumulative}')
+        rows.append(f'lms_http_request_duration_seconds_bucket{_format_labels(labels, le="+Inf")} {v["requests"]}')
+        rows.append(f'lms_http_request_duration_seconds_sum{_format_labels(labels)} {v["duration_us"] / 1e6}')
+        rows.append(f'lms_http_request_duration_seconds_count{_format_labels(labels)} {v["requests"]}')
+    metric('lms_http_request_duration_seconds', 'histogram', 'Wall time of requests.', rows)
+    metric('lms_serializer_seconds_total', 'counter', 'Time spent in serializers.', [
+        f'lms_serializer_seconds_total{_format_labels(labels)} {v["serializer_us"] / 1e6}' for labels, v in values.items()
+    ])
+    metric('lms_db_queries_total', 'counter', 'Database queries run.', [
+        f'lms_db_queries_total{_format_labels(labels)} {v["db_queries"]}' for labels, v in values.items()
+    ])
+    metric('lms_db_query_seconds_total', 'counter', 'Time spent in database queries.', [
+        f'lms_db_query_seconds_total{_format_labels(labels)} {v["db_time_us"] / 1e6}' for labels, v in values.items()
+    ])
+    metric('lms_duplicate_query_requests_total', 'counter', 'Requests that repeated the same query (likely N+1).', [
+        f'lms_duplicate_query_requests_total{_format_labels(labels)} {v["duplicate_queries"]}'
+        for labels, v in values.items()
+    ])
+
+    aliases = sorted(cache.get(POOLS_KEY, set()))
+    stored = cache.get_many([pool_metric_key(alias, field) for alias in aliases for field in POOL_STATS])
+    pool_values = {alias: {field: stored.get(pool_metric_key(alias, field), 0) for field in POOL_STATS}
+                   for alias in aliases}
+    for name, field, help_text in POOL_COUNTERS:
+        metric(name, 'counter', help_text, [
+            f'{name}{{database="{alias}"}} {v[field]}' for alias, v in pool_values.items()
+        ])
+    metric('lms_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a free pooled connection.', [
+        f'lms_db_pool_wait_seconds_total{{database="{alias}"}} {v["wait_us"] / 1e6}' for alias, v in pool_values.items()
+    ])
+    return '\n'.join(lines) + '\n'
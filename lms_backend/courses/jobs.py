@@ -0,0 +1,118 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .media import HANDLERS
+from .models import MediaJob
+
+logger = logging.getLogger(__name__)
+
+# Media job queue.
+#
+# settings.MEDIA_JOB_BACKEND picks how queued jobs run:
+#   'database'  - rows in MediaJob, picked up by `manage.py process_media_jobs`
+#   'immediate' - run in-process right after the transaction commits (dev/tests)
+#
+# A claimed job is 'running' from started_at; one still running MEDIA_JOB_LEASE
+# seconds later was left by a worker that died and goes back to the queue.
+
+def enqueue(kind, object_id):
+    job = MediaJob.objects.create(kind=kind, object_id=object_id)
+    set_target_status(job, 'pending')
+    if settings.MEDIA_JOB_BACKEND == 'immediate':
+        # nothing to run when a worker has claimed the job in the meantime
+        transaction.on_commit(lambda: [run_job(claimed) for claimed in claim(MediaJob.objects.filter(id=job.id))])
+    return job
+
+
+# one insert for many jobs; the caller has already marked the targets 'pending'
+def enqueue_many(kind, object_ids):
+    MediaJob.objects.bulk_create([MediaJob(kind=kind, object_id=object_id) for object_id in object_ids],
+                                 batch_size=1000)
+    if settings.MEDIA_JOB_BACKEND == 'immediate':
+        queued = MediaJob.objects.filter(kind=kind, object_id__in=object_ids)
+        transaction.on_commit(lambda: [run_job(job) for job in claim(queued)])
+
+
+def set_target_status(job, status):
+    # saved (not update()d) so updated_at, the ETags and the course cache follow the status
+    _, model, field = HANDLERS[job.kind]
+    target = model.objects.filter(id=job.object_id).first() if model is not None else None
+    if target is not None:
+        setattr(target, field, status)
+        target.save(update_fields=[field, 'updated_at'])
+
+
+def claim(queryset):
+    # lock the rows (skipping ones another worker holds) and mark them running
+    skip_locked = connections[queryset.db].features.has_select_for_update_skip_locked
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(queryset.select_for_update(skip_locked=skip_locked).filter(status='pending'))
+        MediaJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status='running', attempts=F('attempts') + 1, started_at=now
+        )
+    for job in jobs:
+        job.status = 'running'
+        job.attempts += 1
+        job.started_at = now
+    return jobs
+
+
+def release_stale_jobs():
+    # jobs running past the lease are retried like failed ones, or failed after the last attempt
+    stale = MediaJob.objects.filter(
+        status='running', started_at__lt=timezone.now() - timedelta(seconds=settings.MEDIA_JOB_LEASE)
+    )
+    for job in stale:
+        retry = job.attempts < settings.MEDIA_JOB_MAX_ATTEMPTS
+        released = stale.filter(id=job.id).update(
+            status='pending' if retry else 'failed', run_after=timezone.now(),
+            error='' if retry else 'The worker stopped while running the job.',
+        )
+        if released:  # else it finished or another worker released it in the meantime
+            logger.warning("Media job %s was left running by a worker, %s", job.id, 'retrying' if retry else 'failed')
+            set_target_status(job, 'pending' if retry else 'failed')
+
+
+def claim_batch(batch_size):
+    release_stale_jobs()
+    pending = MediaJob.objects.filter(status='pending', run_after__lte=timezone.now()).order_by('id')
+    return claim(MediaJob.objects.filter(id__in=list(pending.values_list('id', flat=True)[:batch_size])))
+
+
+def run_job(job):
+    handler = HANDLERS[job.kind][0]
+    set_target_status(job, 'processing')
+    try:
+        handler(job.object_id)
+    except ObjectDoesNotExist:
+        # the profile, course or lesson was deleted in the meantime, nothing to retry
+        job.status = 'failed'
+        job.error = 'Object no longer exists.'
+        job.save(update_fields=['status', 'error'])
+        return False
+    except Exception as e:
+        logger.exception("Media job %s failed (attempt %s)", job.id, job.attempts)
+        if job.attempts < settings.MEDIA_JOB_MAX_ATTEMPTS:
+            # back off and let a later run retry it
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=30 * 2 ** job.attempts)
+            set_target_status(job, 'pending')
+        else:
+            job.status = 'failed'
+            set_target_status(job, 'failed')
+        job.error = str(e)
+        job.save(update_fields=['status', 'run_after', 'error'])
+        return False
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.error = ''
+    job.save(update_fields=['status', 'finished_at', 'error'])
+    return True
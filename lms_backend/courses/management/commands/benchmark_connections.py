@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from courses.benchmarks import connections
+
+
+# Compares the per-request cost of a new connection, a persistent connection and the
+# connection pool against the configured database (see DB_CONNECTIONS in settings).
+class Command(BaseCommand):
+    help = 'Benchmark connection overhead per request for each connection mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=connections.MODES,
+                            help='Mode to run (repeatable, default: all)')
+        parser.add_argument('--iterations', type=int, default=500, help='Simulated requests per mode')
+        parser.add_argument('--database', default='default', help='Database alias')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        results = connections.run(options['mode'], options['iterations'], options['database'])
+        meta = results['meta']
+        self.stdout.write(f"{meta['vendor']} via {meta['driver']}, {meta['iterations']} requests per mode")
+        self.stdout.write(f"{'mode':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'connects':>10}")
+        for mode, result in results['modes'].items():
+            self.stdout.write(f"{mode:<12}{result['mean_ms']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                              f"{result['connections_opened']:>10}")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+                f.write('\n')
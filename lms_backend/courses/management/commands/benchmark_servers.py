@@ -0,0 +1,39 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.benchmarks import servers, suite
+
+
+# Compares requests per second and latency of one WSGI (gunicorn) and one ASGI
+# (uvicorn) worker under concurrent load, using the data from `generate_benchmark_data`.
+class Command(BaseCommand):
+    help = 'Benchmark the read endpoints under WSGI and ASGI at several concurrency levels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', action='append', choices=list(servers.SERVERS),
+                            help='Server to run (repeatable, default: all)')
+        parser.add_argument('--concurrency', type=int, action='append',
+                            help='Concurrent clients (repeatable, default: 1, 10 and 50)')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per concurrency level')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for picking courses')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            fixtures = suite.load_fixtures(random.Random(options['seed']))
+            results = servers.run(fixtures, options['server'], options['concurrency'] or (1, 10, 50),
+                                  options['duration'])
+        except (suite.BenchmarkError, servers.ServerError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{'server':<8}{'clients':>9}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for name, levels in results.items():
+            for level in levels:
+                self.stdout.write(f"{name:<8}{level['concurrency']:>9}{level['rps']:>10}{level['p50_ms']:>10}"
+                                  f"{level['p95_ms']:>10}{level['errors']:>8}")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+                f.write('\n')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from courses import recommendations
+
+
+# Rebuilds the "students who took this also took" table from all enrollments.
+# Meant to run offline, e.g. nightly; the API only reads the stored rows.
+class Command(BaseCommand):
+    help = 'Precompute course recommendations from enrollment co-occurrence'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=recommendations.TOP_K,
+                            help='Recommendations kept per course')
+        parser.add_argument('--min-students', type=int, default=recommendations.MIN_STUDENTS,
+                            help='Students two courses must share to be recommended for each other')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Enrollments read per batch')
+        parser.add_argument('--block-size', type=int, default=1000,
+                            help='Courses per block of the co-occurrence product (bounds memory)')
+
+    def handle(self, *args, **options):
+        result = recommendations.build(options['top_k'], options['min_students'], options['chunk_size'],
+                                       options['block_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {result['recommendations']} recommendations for {result['courses']} courses "
+            f"from {result['enrollments']} enrollments."
+        ))
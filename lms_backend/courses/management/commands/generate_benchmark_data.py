@@ -0,0 +1,34 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from courses import caching
+from courses.benchmarks import data
+
+
+# Fills the database with a large generated dataset for `run_benchmarks`.
+# Generated users are named bench<N> and share the password in courses.benchmarks.data.
+class Command(BaseCommand):
+    help = 'Bulk-create benchmark users, courses, lessons, enrollments and reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiplier for the default sizes (100k users, 10k courses, 200k lessons, '
+                                 '2M enrollments, 500k reviews)')
+        for name in data.DEFAULT_SIZES:
+            parser.add_argument(f'--{name}', type=int, help=f'Number of {name} (overrides --scale)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create')
+        parser.add_argument('--clear', action='store_true', help='Delete earlier benchmark data first')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            data.clear()
+        sizes = data.scaled_sizes(options['scale'], **{name: options[name] for name in data.DEFAULT_SIZES})
+        data.generate(sizes, seed=options['seed'], batch_size=options['batch_size'], log=self.stdout.write)
+        # bulk_create skips the counters and signals kept up to date by the views
+        call_command('reconcile_course_stats', stdout=self.stdout)
+        call_command('rollup_course_stats', '--rebuild', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        call_command('build_recommendations', stdout=self.stdout)
+        caching.invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS('Benchmark data generated.'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.jobs import claim_batch, run_job
+
+
+# Worker for the database media job queue (MEDIA_JOB_BACKEND = 'database').
+# Several workers can run side by side, jobs are claimed with SELECT ... SKIP LOCKED.
+class Command(BaseCommand):
+    help = 'Process queued media jobs (image variants, video metadata)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Process the jobs that are currently due and exit')
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help='Number of jobs claimed at a time')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            jobs = claim_batch(options['batch_size'])
+            for job in jobs:
+                ok = run_job(job)
+                self.stdout.write(f"{'done' if ok else 'failed'}: {job}")
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from courses import search
+from courses.models import Course, Lesson
+
+
+# Rewrites the search index rows of every course and lesson, one chunk per transaction,
+# so searches keep working while it runs. Needed once after migrating and after bulk
+# loads that bypass the save signals (e.g. generate_benchmark_data).
+class Command(BaseCommand):
+    help = 'Rebuild the full text search index for all courses and lessons'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of courses or lessons indexed per batch')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        courses = Course.objects.only('id', 'title', 'description', 'published').order_by('id')
+        indexed_courses = self.index(courses, search.index_courses, chunk_size)
+        lessons = Lesson.objects.only('id', 'course_id', 'title', 'content').order_by('id')
+        indexed_lessons = self.index(lessons, search.index_lessons, chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed_courses} courses and {indexed_lessons} lessons.'))
+
+    def index(self, queryset, index_chunk, chunk_size):
+        indexed = 0
+        chunk = []
+        for row in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                index_chunk(chunk)
+                indexed += len(chunk)
+                chunk = []
+        if chunk:
+            index_chunk(chunk)
+            indexed += len(chunk)
+        return indexed
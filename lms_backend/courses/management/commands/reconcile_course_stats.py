@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from courses.models import Course, Enrollment, Review
+
+
+# Recomputes the denormalized rating/enrollment counters on Course from the
+# Review and Enrollment tables and fixes any course that has drifted.
+class Command(BaseCommand):
+    help = 'Recompute Course.rating_sum, rating_count and enrollment_count from reviews and enrollments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of courses processed per batch')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted courses without saving them')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        checked = fixed = 0
+
+        courses = Course.objects.only('id', 'rating_sum', 'rating_count', 'enrollment_count').order_by('id')
+        chunk = []
+        for course in courses.iterator(chunk_size=chunk_size):
+            chunk.append(course)
+            if len(chunk) == chunk_size:
+                fixed += self.reconcile(chunk, options['dry_run'])
+                checked += len(chunk)
+                chunk = []
+        if chunk:
+            fixed += self.reconcile(chunk, options['dry_run'])
+            checked += len(chunk)
+
+        verb = 'would fix' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} courses, {verb} {fixed}.'))
+
+    def reconcile(self, courses, dry_run):
+        ids = [course.id for course in courses]
+        # one grouped query per table for the whole batch
+        enrollments = dict(
+            Enrollment.objects.filter(course_id__in=ids).order_by().values('course_id')
+            .annotate(c=Count('id')).values_list('course_id', 'c')
+        )
+        ratings = {
+            row['course_id']: row
+            for row in Review.objects.filter(course_id__in=ids).order_by().values('course_id')
+            .annotate(total=Sum('rating'), c=Count('id'))
+        }
+
+        drifted = []
+        for course in courses:
+            rating = ratings.get(course.id, {})
+            expected = (rating.get('total', 0), rating.get('c', 0), enrollments.get(course.id, 0))
+            if (course.rating_sum, course.rating_count, course.enrollment_count) != expected:
+                course.rating_sum, course.rating_count, course.enrollment_count = expected
+                drifted.append(course)
+
+        if drifted and not dry_run:
+            with transaction.atomic():
+                Course.objects.bulk_update(drifted, ['rating_sum', 'rating_count', 'enrollment_count'])
+        return len(drifted)
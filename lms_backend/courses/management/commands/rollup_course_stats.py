@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.analytics import rebuild_daily_stats, update_daily_stats
+
+
+# Fills CourseDailyStats from Enrollment and Review. Each run only reads the rows
+# created since the previous one (high-water mark), so it can run every few minutes
+# from cron / a scheduler; running it twice in a row adds nothing.
+class Command(BaseCommand):
+    help = 'Roll up enrollments and reviews per course and day into CourseDailyStats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute the whole table instead of only the new rows')
+        parser.add_argument('--since', help='With --rebuild, only recompute the days from this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            try:
+                since = date.fromisoformat(options['since']) if options['since'] else None
+            except ValueError:
+                raise CommandError('--since must be a date like 2025-01-31')
+            rows = rebuild_daily_stats(since)
+        else:
+            rows = update_daily_stats()
+        self.stdout.write(self.style.SUCCESS(f'Updated {rows} daily stats rows.'))
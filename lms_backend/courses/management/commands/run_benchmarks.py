@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.benchmarks import suite
+
+BASELINE = Path(suite.__file__).with_name('baseline.json')
+
+
+# Measures latency percentiles and queries per request for the main API endpoints
+# against the data from `generate_benchmark_data`, and checks them against a baseline.
+class Command(BaseCommand):
+    help = 'Benchmark the API and compare the results with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=list(suite.SCENARIOS),
+                            help='Scenario to run (repeatable, default: all)')
+        parser.add_argument('--iterations', type=int, default=200, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per scenario')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for picking courses')
+        parser.add_argument('--baseline', default=str(BASELINE), help='Baseline JSON file')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed p95 growth over the baseline (0.2 = 20%%)')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+        parser.add_argument('--update-baseline', action='store_true', help='Save the results as the new baseline')
+        parser.add_argument('--check', action='store_true', help='Fail when a scenario regressed')
+
+    def handle(self, *args, **options):
+        try:
+            results = suite.run_suite(options['scenario'], options['iterations'], options['warmup'],
+                                      options['cold'], options['seed'])
+        except suite.BenchmarkError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{'scenario':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+        for name, result in results['scenarios'].items():
+            self.stdout.write(f"{name:<18}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+                              f"{result['max_queries']:>9}")
+        if options['output']:
+            suite.write_results(options['output'], results)
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            suite.write_results(baseline_path, results)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f'No baseline at {baseline_path}, run with --update-baseline to create one.')
+            return
+
+        found = suite.regressions(results, suite.load_baseline(baseline_path), options['threshold'])
+        for line in found:
+            self.stdout.write(self.style.WARNING(f'regression: {line}'))
+        if found and options['check']:
+            raise CommandError(f'{len(found)} benchmark regression(s)')
+        if not found:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+from io import BytesIO
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .aws_s3 import get_s3_client
+from .models import Course, Lesson, Profile
+
+logger = logging.getLogger(__name__)
+
+# Media processing run by the job queue in courses/jobs.py, never in the request cycle.
+
+IMAGE_FORMATS = {'jpg': 'JPEG', 'webp': 'WEBP'}
+
+
+def make_image_variants(field_file, widths):
+    """Save resized JPEG and WebP copies of an image next to the original.
+
+    Returns {'jpg': {'160': name, ...}, 'webp': {...}} with storage names. Widths larger
+    than the original are skipped (but the smallest is always produced).
+    """
+    storage = field_file.storage
+    with field_file.open('rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    stem = os.path.splitext(field_file.name)[0]
+    widths = sorted(widths)
+    variants = {ext: {} for ext in IMAGE_FORMATS}
+    for width in widths:
+        if width > image.width and width != widths[0]:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS) if width < image.width else image
+        for ext, image_format in IMAGE_FORMATS.items():
+            out = resized.convert('RGB') if image_format == 'JPEG' else resized
+            buffer = BytesIO()
+            out.save(buffer, image_format, quality=settings.MEDIA_IMAGE_QUALITY, optimize=True)
+            variants[ext][str(width)] = storage.save(f'{stem}_{width}w.{ext}', ContentFile(buffer.getvalue()))
+    return variants
+
+
+def delete_replaced_variants(storage, old, new):
+    # once the new variants are saved, remove the files of earlier runs; a failed delete
+    # only leaves an unused file behind, so it doesn't fail the job
+    keep = {name for names in new.values() for name in names.values()}
+    for name in {name for names in (old or {}).values() for name in names.values()} - keep:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception("Could not delete replaced image variant %s", name)
+
+
+def process_profile_picture(profile_id):
+    profile = Profile.objects.get(id=profile_id)
+    old_variants = profile.picture_variants
+    if profile.profile_picture:
+        profile.picture_variants = make_image_variants(profile.profile_picture, settings.MEDIA_PROFILE_PICTURE_WIDTHS)
+        profile.picture_status = 'ready'
+    else:
+        profile.picture_variants, profile.picture_status = {}, 'none'
+    profile.save(update_fields=['picture_variants', 'picture_status', 'updated_at'])
+    delete_replaced_variants(profile.profile_picture.storage, old_variants, profile.picture_variants)
+
+
+def process_course_thumbnail(course_id):
+    course = Course.objects.get(id=course_id)
+    old_variants = course.thumbnail_variants
+    variants = make_image_variants(course.thumbnail, settings.MEDIA_THUMBNAIL_WIDTHS) if course.thumbnail else {}
+    # save() so the course cache and ETag see the new variants
+    course.thumbnail_variants = variants
+    course.save(update_fields=['thumbnail_variants', 'updated_at'])
+    delete_replaced_variants(course.thumbnail.storage, old_variants, variants)
+
+
+def s3_key_from_url(video_url):
+    # videos are stored as https://<bucket>.s3.amazonaws.com/<key>
+    return urlparse(video_url).path.lstrip('/')
+
+
+def probe_duration(video_url):
+    # ffprobe reads just the container headers over HTTP; skipped when not installed
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is None:
+        logger.warning("ffprobe not found, video duration not recorded for %s", video_url)
+        return None
+    result = subprocess.run(
+        [ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', video_url],
+        capture_output=True, text=True, timeout=120, check=True,
+    )
+    duration = json.loads(result.stdout).get('format', {}).get('duration')
+    return float(duration) if duration else None
+
+
+def process_lesson_video(lesson_id):
+    lesson = Lesson.objects.get(id=lesson_id)
+    if lesson.video_url:
+        head = get_s3_client().head_object(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=s3_key_from_url(lesson.video_url)
+        )
+        lesson.video_size = head['ContentLength']
+        lesson.video_duration = probe_duration(lesson.video_url)
+        lesson.video_status = 'ready'
+    else:
+        lesson.video_size, lesson.video_duration, lesson.video_status = None, None, 'none'
+    lesson.save(update_fields=['video_size', 'video_duration', 'video_status', 'updated_at'])
+
+
+# job kind -> (handler, model and status field updated when the job fails)
+HANDLERS = {
+    'profile_picture': (process_profile_picture, Profile, 'picture_status'),
+    'course_thumbnail': (process_course_thumbnail, None, None),
+    'lesson_video': (process_lesson_video, Lesson, 'video_status'),
+}
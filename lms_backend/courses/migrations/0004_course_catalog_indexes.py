@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# FULLTEXT indexes are MySQL specific, other backends fall back to icontains search
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX course_fulltext_idx ON courses_course (title, description)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX course_fulltext_idx ON courses_course')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_alter_profile_role'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['published', 'category', 'created_at'], name='course_catalog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['instructor', 'published'], name='course_instructor_pub_idx'),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
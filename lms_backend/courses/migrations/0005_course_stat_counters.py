@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 18:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+# fill the new counters for existing courses
+def populate_counters(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Review = apps.get_model('courses', 'Review')
+
+    def per_course(model, aggregate):
+        return Coalesce(Subquery(
+            model.objects.filter(course=OuterRef('pk')).order_by().values('course')
+            .annotate(value=aggregate).values('value')
+        ), 0)
+
+    Course.objects.update(
+        enrollment_count=per_course(Enrollment, Count('id')),
+        rating_count=per_course(Review, Count('id')),
+        rating_sum=per_course(Review, Sum('rating')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_course_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
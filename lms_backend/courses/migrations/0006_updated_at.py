@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+# existing courses and lessons count as last modified when they were created
+def copy_created_at(apps, schema_editor):
+    for model_name in ('Course', 'Lesson'):
+        apps.get_model('courses', model_name).objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_course_stat_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 18:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_media_processing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('enrollments', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course', 'enrolled_at'], name='enrollment_course_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='coursedailystats',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.course'),
+        ),
+        migrations.AddIndex(
+            model_name='coursedailystats',
+            index=models.Index(fields=['date'], name='coursedailystats_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='coursedailystats',
+            unique_together={('course', 'date')},
+        ),
+    ]
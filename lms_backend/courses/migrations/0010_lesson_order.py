@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 18:46
+
+from django.db import migrations, models
+
+
+# existing lessons keep their current (creation) order: 0, 1, 2, ... within each course
+def number_lessons(apps, schema_editor):
+    Lesson = apps.get_model('courses', 'Lesson')
+    batch, course_id, position = [], None, 0
+    for lesson in Lesson.objects.only('id', 'course_id').order_by('course_id', 'id').iterator(chunk_size=2000):
+        position = position + 1 if lesson.course_id == course_id else 0
+        course_id = lesson.course_id
+        lesson.order = position
+        batch.append(lesson)
+        if len(batch) == 1000:
+            Lesson.objects.bulk_update(batch, ['order'])
+            batch = []
+    Lesson.objects.bulk_update(batch, ['order'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_incremental_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='lesson',
+            options={'ordering': ['order', 'id']},
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='order',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['course', 'order'], name='lesson_course_order_idx'),
+        ),
+        migrations.RunPython(number_lessons, migrations.RunPython.noop),
+    ]
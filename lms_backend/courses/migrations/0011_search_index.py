@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 19:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# the index starts empty, fill it for existing courses with `manage.py rebuild_search_index`
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_lesson_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=40)),
+                ('published', models.BooleanField(default=False)),
+                ('weight', models.PositiveIntegerField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.course')),
+                ('lesson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.lesson')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'published', 'weight'], name='search_term_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_course_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediajob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,9 +1,21 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.utils import timezone
+from django.db.models.functions import Coalesce
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete
+from . import caching
 from .storage_backends import PublicMediaStorage, PublicProfilePicStorage, PublicThumbnailStorage
 
+# processing state of uploaded media (profile pictures, thumbnails, lesson videos)
+MEDIA_STATUS_CHOICES = [
+    ('none', 'None'),
+    ('pending', 'Pending'),
+    ('processing', 'Processing'),
+    ('ready', 'Ready'),
+    ('failed', 'Failed'),
+]
+
 # user: soz ,password:Soz12345678
 # admin:Admin12345678
 
@@ -17,6 +29,10 @@ class Profile(models.Model):
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='student')
     profile_picture = models.ImageField(storage=PublicProfilePicStorage(),upload_to='', null=True, blank=True)
     bio = models.TextField(null=True, blank=True)  # Added bio field
+    # resized/re-encoded copies made by the media worker: {'jpg': {'64': name, ...}, 'webp': {...}}
+    picture_variants = models.JSONField(default=dict, blank=True)
+    picture_status = models.CharField(max_length=10, choices=MEDIA_STATUS_CHOICES, default='none')
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.user.username
@@ -31,6 +47,35 @@ class Profile(models.Model):
 # def save_profile(sender, instance, **kwargs):
 #     instance.profile.save()
 
+# queryset helpers for loading courses without N+1 queries
+class CourseQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(published=True)
+
+    def for_listing(self):
+        # Slim catalog rows: instructor and profile joined, lesson count as a
+        # correlated subquery and the average rating from the stored counters.
+        lesson_count = Lesson.objects.filter(course=models.OuterRef('pk')).order_by().values('course') \
+            .annotate(c=models.Count('id')).values('c')
+        return self.select_related('instructor__profile').annotate(
+            lesson_count=Coalesce(models.Subquery(lesson_count), 0),
+            average_rating=models.Case(
+                models.When(rating_count=0, then=None),
+                default=models.ExpressionWrapper(
+                    models.F('rating_sum') * 1.0 / models.F('rating_count'), output_field=models.FloatField()
+                ),
+                output_field=models.FloatField(),
+            ),
+        )
+
+    def for_catalog(self):
+        # Instructor and profile come in the same query, the lesson outline in one
+        # extra query. Lesson bodies are never loaded here, see LessonContentView.
+        lessons = Lesson.objects.only('id', 'course_id', 'title', 'video_url', 'video_duration', 'order')
+        return self.select_related('instructor__profile').prefetch_related(
+            models.Prefetch('lessons', queryset=lessons)
+        )
+
 # a model for managing courses   
 class Course(models.Model):
     CATEGORY_CHOICES = [
@@ -49,9 +94,26 @@ class Course(models.Model):
     instructor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='courses')
     published = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # bumped whenever the course or one of its lessons changes, used for ETag/Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
     students = models.ManyToManyField(User, through='Enrollment', related_name='enrolled_courses')
     thumbnail = models.ImageField( storage=PublicThumbnailStorage(),upload_to='', blank=True, null=True)
     category = models.CharField(max_length=100,choices=CATEGORY_CHOICES, default='programming')
+    thumbnail_variants = models.JSONField(default=dict, blank=True)  # filled by the media worker
+    # denormalized counters, kept up to date with F() updates by the enroll and review views
+    # (run `manage.py reconcile_course_stats` to fix any drift)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    enrollment_count = models.PositiveIntegerField(default=0)
+
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # catalog listing: published courses filtered by category, newest first
+            models.Index(fields=['published', 'category', 'created_at'], name='course_catalog_idx'),
+            models.Index(fields=['instructor', 'published'], name='course_instructor_pub_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -62,12 +124,30 @@ class Lesson(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField() 
     video_url = models.URLField(null=True, blank=True)
+    # video metadata recorded by the media worker
+    video_status = models.CharField(max_length=10, choices=MEDIA_STATUS_CHOICES, default='none')
+    video_size = models.BigIntegerField(null=True, blank=True)  # bytes
+    video_duration = models.FloatField(null=True, blank=True)  # seconds
+    order = models.PositiveIntegerField(default=0)  # position within the course
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        ordering = ['order', 'id']
+        indexes = [models.Index(fields=['course', 'order'], name='lesson_course_order_idx')]
 
     def __str__(self):
         return self.title
 
+    def delete(self, *args, **kwargs):
+        # a single lesson delete changes the course like a save does. This is not a
+        # post_delete receiver: that would run once per row for bulk and cascade deletes
+        # (sync_lessons, course delete) and turn them from one DELETE into a load of
+        # every lesson first.
+        deleted = super().delete(*args, **kwargs)
+        touch_course(self.course_id)
+        return deleted
+
 # a model for enrollment where students can enroll in a class
 class Enrollment(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -76,6 +156,12 @@ class Enrollment(models.Model):
     
     class Meta:
             unique_together = ['student', 'course']  # Prevent double-enrollment
+            indexes = [
+                # per-course enrollment trends (instructor analytics)
+                models.Index(fields=['course', 'enrolled_at'], name='enrollment_course_date_idx'),
+                # incremental rollups read the rows newer than their high-water mark
+                models.Index(fields=['enrolled_at'], name='enrollment_date_idx'),
+            ]
 
 # a model for review where users can leave a review 
 class Review(models.Model):
@@ -87,6 +173,137 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('course', 'student')  # Prevent duplicate reviews
+        indexes = [models.Index(fields=['created_at'], name='review_date_idx')]  # incremental rollups
+
+    def __str__(self):
+        return f"{self.course.title} - {self.student.username} ({self.rating})"
+
+# enrollments and reviews per course and day, kept up to date by `manage.py rollup_course_stats`
+# so reports never scan the Enrollment and Review tables
+class CourseDailyStats(models.Model):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    enrollments = models.PositiveIntegerField(default=0)
+    reviews = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('course', 'date')
+        indexes = [models.Index(fields=['date'], name='coursedailystats_date_idx')]
+
+    def __str__(self):
+        return f"{self.course_id} {self.date}: {self.enrollments} enrollments, {self.reviews} reviews"
+
+# how far a rollup job has processed its source rows (high-water mark)
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    processed_until = models.DateTimeField()
 
     def __str__(self):
-        return f"{self.course.title} - {self.student.username} ({self.rating})"
\ No newline at end of file
+        return f"{self.name}: {self.processed_until}"
+
+# a queue of media processing work, run by `manage.py process_media_jobs`
+class MediaJob(models.Model):
+    KIND_CHOICES = [
+        ('profile_picture', 'Profile picture'),
+        ('course_thumbnail', 'Course thumbnail'),
+        ('lesson_video', 'Lesson video'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()  # Profile, Course or Lesson id depending on kind
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)  # when the current attempt was claimed
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'], name='mediajob_queue_idx')]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} ({self.status})"
+
+# inverted index for course search, one row per term and course or lesson (see search.py)
+class SearchEntry(models.Model):
+    term = models.CharField(max_length=40)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    published = models.BooleanField(default=False)  # copied from the course, searches only read published rows
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['term', 'published', 'weight'], name='search_term_idx')]
+
+    def __str__(self):
+        return f"{self.term}: course {self.course_id}, lesson {self.lesson_id} ({self.weight})"
+
+# "students who took this also took": a course's nearest courses in the enrollment
+# graph, rebuilt offline by `manage.py build_recommendations` (see recommendations.py)
+class CourseRecommendation(models.Model):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommended_by')
+    rank = models.PositiveSmallIntegerField()  # 0 is the most similar
+    score = models.FloatField()  # cosine similarity of the two courses' students
+    students = models.PositiveIntegerField()  # students enrolled in both
+
+    class Meta:
+        unique_together = ('course', 'rank')
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.recommended_id} (#{self.rank}, {self.score:.3f})"
+
+# drop cached course payloads and catalog pages whenever a course or one of its lessons changes
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    caching.invalidate_course(instance.pk)
+
+# fields of a course shown in other courses' "also taken" lists
+ALSO_TAKEN_FIELDS = {'title', 'thumbnail', 'published'}
+
+# the courses recommending this one show its title and thumbnail (or drop it once it is
+# unpublished or deleted), so their payloads and ETags change with it; pre_delete as the
+# recommendations are deleted with the course
+@receiver(post_save, sender=Course)
+@receiver(pre_delete, sender=Course)
+def touch_recommending_courses(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not ALSO_TAKEN_FIELDS & set(update_fields)):
+        return
+    recommending = list(CourseRecommendation.objects.filter(recommended_id=instance.pk)
+                        .values_list('course_id', flat=True))
+    if recommending:
+        Course.objects.filter(pk__in=recommending).update(updated_at=timezone.now())
+        caching.invalidate_course_details(recommending)
+
+@receiver(post_save, sender=Profile)
+def invalidate_instructor_course_cache(sender, instance, **kwargs):
+    # cached courses embed the instructor's public profile
+    if instance.role == 'instructor':
+        for course_id in Course.objects.filter(instructor_id=instance.user_id).values_list('id', flat=True):
+            caching.invalidate_course(course_id)
+
+# a new enrollment retires the student's cached enrollment set; bulk_enroll and the
+# admin invalidate explicitly. Enrollments removed by a course delete are left in the
+# sets on purpose (the course is gone), so that delete stays a single fast DELETE.
+@receiver(post_save, sender=Enrollment)
+def invalidate_student_enrollments(sender, instance, created, **kwargs):
+    if created:
+        caching.invalidate_enrollments([instance.student_id])
+
+def touch_course(course_id):
+    # a lesson change is a change of the course payload
+    Course.objects.filter(pk=course_id).update(updated_at=timezone.now())
+    caching.invalidate_course(course_id)
+
+# deletes go through Lesson.delete
+@receiver(post_save, sender=Lesson)
+def invalidate_lesson_course_cache(sender, instance, **kwargs):
+    touch_course(instance.course_id)
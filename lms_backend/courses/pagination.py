@@ -0,0 +1,83 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+# keyset pagination for the course catalog, newest courses first
+#
+# DRF's CursorPagination only puts the first ordering field in the cursor and steps
+# over equal values with an OFFSET, capped at offset_cutoff, so more than 1000 courses
+# with the same created_at, price or rating would page in a loop. Here the cursor holds
+# the values of every ordering field, the last one being the unique id, and a page
+# starts after that row: (created_at, id) < (cursor created_at, cursor id).
+class CourseCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        current_position = self.cursor.position if self.cursor is not None else None
+
+        ordering = [self._reverse(term) for term in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = self.after(queryset, ordering, current_position)
+
+        # one extra row tells whether there is a following page; positions are unique,
+        # so the cursor never needs an offset
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = (self._get_position_from_instance(results[-1], self.ordering)
+                               if len(results) > len(self.page) else None)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = True, current_position
+            self.has_previous, self.previous_position = following_position is not None, following_position
+        else:
+            self.has_next, self.next_position = following_position is not None, following_position
+            self.has_previous, self.previous_position = current_position is not None, current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def after(self, queryset, ordering, position):
+        # rows past the position in the given ordering, as a row comparison:
+        # a > x OR (a = x AND b > y) ..., plus a >= x so the first column's index is used
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        fields = [(term.lstrip('-'), 'lt' if term.startswith('-') else 'gt', value)
+                  for term, value in zip(ordering, values)]
+        after = Q()
+        for i, (field, lookup, value) in enumerate(fields):
+            equal = {previous: previous_value for previous, _, previous_value in fields[:i]}
+            after |= Q(**equal, **{f'{field}__{lookup}': value})
+        field, lookup, value = fields[0]
+        try:
+            return queryset.filter(after, **{f'{field}__{lookup}e': value})
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _reverse(term):
+        return term[1:] if term.startswith('-') else f'-{term}'
+
+    def _get_position_from_instance(self, instance, ordering):
+        fields = [term.lstrip('-') for term in ordering]
+        values = [instance[field] if isinstance(instance, dict) else getattr(instance, field) for field in fields]
+        return json.dumps([str(value) for value in values], separators=(',', ':'))
@@ -0,0 +1,134 @@
+from array import array
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from . import caching
+from .models import Course, CourseRecommendation, Enrollment
+
+# Course recommendations from the enrollment graph.
+#
+# `manage.py build_recommendations` reads Enrollment into a sparse students x courses
+# matrix and multiplies it with itself, block by block of courses, which gives the
+# number of students every two courses share. Each course keeps its TOP_K neighbours
+# by cosine similarity (shared / sqrt(students of one * students of the other)) in
+# CourseRecommendation. Pairs sharing fewer than MIN_STUDENTS students are dropped as
+# noise, and only published courses are recommended.
+#
+# Serving reads the stored rows: "students who took this also took" is one lookup on
+# the (course, rank) index for the course detail, "recommended for you" sums the
+# neighbours of the courses a student is enrolled in with one grouped query.
+
+TOP_K = 20
+MIN_STUDENTS = 2
+ALSO_TAKEN_LIMIT = 10
+
+
+def also_taken_queryset(course_id, limit=ALSO_TAKEN_LIMIT):
+    return (Course.objects.filter(recommended_by__course_id=course_id, published=True)
+            .annotate(students_in_common=F('recommended_by__students'))
+            .order_by('recommended_by__rank').only('id', 'title', 'thumbnail')[:limit])
+
+
+def also_taken_data(course):
+    return {'id': course.id, 'title': course.title, 'thumbnail': course.thumbnail.url if course.thumbnail else None,
+            'students_in_common': course.students_in_common}
+
+
+def also_taken(course_id):
+    return [also_taken_data(course) for course in also_taken_queryset(course_id)]
+
+
+async def aalso_taken(course_id):
+    return [also_taken_data(course) async for course in also_taken_queryset(course_id)]
+
+
+def for_student(enrolled_ids, limit=10):
+    # neighbours of the student's courses ranked by their summed similarity; the most
+    # popular courses for students without any (new students, niche courses)
+    courses = Course.objects.published().exclude(id__in=enrolled_ids)
+    if enrolled_ids:
+        recommended = list(courses.filter(recommended_by__course_id__in=enrolled_ids)
+                           .annotate(score=Sum('recommended_by__score')).order_by('-score', 'id')[:limit])
+        if recommended:
+            return recommended
+    return list(courses.order_by('-enrollment_count', '-id')[:limit])
+
+
+def enrollment_matrix(chunk_size=10000):
+    # (course ids, sparse students x courses matrix of ones)
+    import numpy as np  # imported here, the web processes only read the stored rows
+    from scipy import sparse
+
+    student_ids, course_ids = array('q'), array('q')
+    rows = Enrollment.objects.order_by().values_list('student_id', 'course_id')
+    for student_id, course_id in rows.iterator(chunk_size=chunk_size):
+        student_ids.append(student_id)
+        course_ids.append(course_id)
+    _, row_index = np.unique(np.frombuffer(student_ids, dtype=np.int64), return_inverse=True)
+    courses, column_index = np.unique(np.frombuffer(course_ids, dtype=np.int64), return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(row_index), dtype=np.float32), (row_index, column_index)),
+        shape=(row_index.max() + 1 if len(row_index) else 0, len(courses)),
+    )
+    return courses, matrix
+
+
+def neighbours(courses, matrix, recommendable, top_k=TOP_K, min_students=MIN_STUDENTS, block_size=1000):
+    # yields (course id, [(neighbour id, score, shared students)] best first) per course;
+    # recommendable is a boolean mask over courses
+    import numpy as np
+
+    by_course = matrix.T.tocsr()
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    for start in range(0, len(courses), block_size):
+        shared = (by_course[start:start + block_size] @ matrix).tocsr()  # block x courses
+        rows = np.repeat(np.arange(shared.shape[0]), np.diff(shared.indptr))
+        columns, counts = shared.indices, shared.data
+        keep = (counts >= min_students) & (columns != rows + start) & recommendable[columns]
+        rows, columns, counts = rows[keep], columns[keep], counts[keep]
+        scores = counts / (norms[rows + start] * norms[columns])
+        # best first within each row: sort by row, then score descending, then course id
+        order = np.lexsort((courses[columns], -scores, rows))
+        rows, columns, counts, scores = rows[order], columns[order], counts[order], scores[order]
+        bounds = np.searchsorted(rows, np.arange(shared.shape[0] + 1))
+        for row in range(shared.shape[0]):
+            lo, hi = bounds[row], min(bounds[row + 1], bounds[row] + top_k)
+            if lo < hi:
+                yield int(courses[start + row]), [
+                    (int(courses[column]), float(score), int(count))
+                    for column, score, count in zip(columns[lo:hi], scores[lo:hi], counts[lo:hi])
+                ]
+
+
+@transaction.atomic
+def store(neighbour_lists, batch_size=1000):
+    # replaces all recommendations; readers see the old rows until the commit
+    CourseRecommendation.objects.all().delete()
+    stored = 0
+    batch = []
+    for course_id, neighbour_list in neighbour_lists:
+        batch.extend(
+            CourseRecommendation(course_id=course_id, recommended_id=recommended_id, rank=rank, score=score,
+                                 students=students)
+            for rank, (recommended_id, score, students) in enumerate(neighbour_list)
+        )
+        if len(batch) >= batch_size:
+            CourseRecommendation.objects.bulk_create(batch)
+            stored += len(batch)
+            batch = []
+    CourseRecommendation.objects.bulk_create(batch)
+    stored += len(batch)
+    # cached course payloads and their ETags embed the old recommendations
+    transaction.on_commit(caching.invalidate_recommendations)
+    return stored
+
+
+def build(top_k=TOP_K, min_students=MIN_STUDENTS, chunk_size=10000, block_size=1000):
+    import numpy as np
+
+    courses, matrix = enrollment_matrix(chunk_size)
+    published = Course.objects.published().values_list('id', flat=True)
+    recommendable = np.isin(courses, np.fromiter(published.iterator(chunk_size=chunk_size), dtype=np.int64))
+    stored = store(neighbours(courses, matrix, recommendable, top_k, min_students, block_size))
+    return {'enrollments': matrix.nnz, 'courses': len(courses), 'recommendations': stored}
@@ -0,0 +1,199 @@
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.html import escape
+
+from .models import Course, Lesson, SearchEntry
+
+# Full text search over course titles and descriptions and lesson titles and content.
+#
+# SearchEntry is an inverted index: one row per term and document, where a document
+# is a course (title + description) or one of its lessons (title + content). The
+# weight of a row adds up the term's occurrences per field, each capped at TF_CAP and
+# multiplied by the field weight, so a title match outranks a match deep in a lesson.
+# Rows are rewritten when a course or lesson is saved (update_search_index below, and
+# the bulk paths in bulk.py and serializers.py) and removed with it by the cascade;
+# `manage.py rebuild_search_index` rebuilds everything in chunks.
+#
+# A query reads at most MAX_CANDIDATES rows per term, the heaviest first, from the
+# (term, published, weight) index, so its cost does not grow with the number of
+# lessons. Courses are ranked by the number of query terms they match, then by the
+# summed weight; results past the candidates of the most common terms are not found,
+# which only affects very deep pages of very broad queries.
+
+FIELD_WEIGHTS = {
+    'course_title': 8,
+    'course_description': 2,
+    'lesson_title': 4,
+    'lesson_content': 1,
+}
+TF_CAP = 3
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+MAX_QUERY_TERMS = 6
+MAX_CANDIDATES = 1000
+SNIPPET_LENGTH = 160
+
+STOPWORDS = frozenset('''
+    a an and are as at be but by for from has have how in into is it its of on or
+    that the this to was were what when where which who will with you your
+'''.split())
+
+WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    words = WORD.findall((text or '').lower())
+    return [word for word in words if MIN_TERM_LENGTH <= len(word) <= MAX_TERM_LENGTH and word not in STOPWORDS]
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def _weights(**fields):
+    # {term: weight} for a document made of the given fields
+    weights = Counter()
+    for field, text in fields.items():
+        for term, count in Counter(tokenize(text)).items():
+            weights[term] += FIELD_WEIGHTS[field] * min(count, TF_CAP)
+    return weights
+
+
+def _entries(course_id, lesson_id, published, weights):
+    return [
+        SearchEntry(term=term, course_id=course_id, lesson_id=lesson_id, published=published, weight=weight)
+        for term, weight in weights.items()
+    ]
+
+
+@transaction.atomic
+def index_courses(courses):
+    # courses need id, title, description and published
+    courses = list(courses)
+    ids = [course.id for course in courses]
+    SearchEntry.objects.filter(course_id__in=ids, lesson__isnull=True).delete()
+    # lesson rows only follow the course's published flag
+    published = [course.id for course in courses if course.published]
+    hidden = [course.id for course in courses if not course.published]
+    SearchEntry.objects.filter(Q(course_id__in=published, published=False) | Q(course_id__in=hidden, published=True)) \
+        .update(published=Q(course_id__in=published))
+    SearchEntry.objects.bulk_create([
+        entry
+        for course in courses
+        for entry in _entries(course.id, None, course.published,
+                              _weights(course_title=course.title, course_description=course.description))
+    ], batch_size=1000)
+
+
+@transaction.atomic
+def index_lessons(lessons):
+    # lessons need id, course_id, title and content
+    lessons = list(lessons)
+    published = dict(Course.objects.filter(id__in={lesson.course_id for lesson in lessons})
+                     .values_list('id', 'published'))
+    SearchEntry.objects.filter(lesson_id__in=[lesson.id for lesson in lessons]).delete()
+    SearchEntry.objects.bulk_create([
+        entry
+        for lesson in lessons
+        for entry in _entries(lesson.course_id, lesson.id, published.get(lesson.course_id, False),
+                              _weights(lesson_title=lesson.title, lesson_content=lesson.content))
+    ], batch_size=1000)
+
+
+INDEXED_FIELDS = {Course: {'title', 'description', 'published'}, Lesson: {'title', 'content'}}
+
+
+# keep the index up to date on every save; deletes are handled by the cascade
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not INDEXED_FIELDS[sender] & set(update_fields):
+        return
+    if sender is Course:
+        index_courses([instance])
+    else:
+        index_lessons([instance])
+
+
+def rank(terms):
+    # [(course_id, matched terms, score, best lesson id or None)], best first
+    found = {}
+    for term in terms:
+        rows = (SearchEntry.objects.filter(term=term, published=True).order_by('-weight')
+                .values_list('course_id', 'lesson_id', 'weight')[:MAX_CANDIDATES])
+        matched = set()
+        for course_id, lesson_id, weight in rows:
+            result = found.setdefault(course_id, {'matched': 0, 'score': 0, 'lesson': None, 'lesson_weight': 0})
+            if course_id not in matched:
+                matched.add(course_id)
+                result['matched'] += 1
+            result['score'] += weight
+            if lesson_id is not None and weight > result['lesson_weight']:
+                result['lesson'], result['lesson_weight'] = lesson_id, weight
+    ranked = sorted(found.items(), key=lambda item: (item[1]['matched'], item[1]['score'], item[0]), reverse=True)
+    return [(course_id, result['matched'], result['score'], result['lesson']) for course_id, result in ranked]
+
+
+def highlight(text, terms, length=None):
+    # HTML-escaped text with the query terms wrapped in <mark>; with a length, only a
+    # snippet of about that many characters around the first match
+    text = text or ''
+    pattern = re.compile(r'\b(%s)\b' % '|'.join(map(re.escape, terms)), re.IGNORECASE) if terms else None
+    if length is not None and len(text) > length:
+        match = pattern.search(text) if pattern else None
+        start = max(0, match.start() - length // 3) if match else 0
+        if start:
+            start = text.find(' ', start) + 1 or start
+        end = start + length
+        if end < len(text):
+            end = text.rfind(' ', start, end)
+            if end <= start:
+                end = start + length
+        text = ('…' if start else '') + text[start:end] + ('…' if end < len(text) else '')
+    if pattern is None:
+        return escape(text)
+    parts = pattern.split(text)
+    # split() with one group alternates between plain text and matches
+    return ''.join(escape(part) if i % 2 == 0 else f'<mark>{escape(part)}</mark>' for i, part in enumerate(parts))
+
+
+def search(query, offset=0, limit=20):
+    # (one page of results, whether there are more) for published courses
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+    ranked = rank(terms)
+    page = ranked[offset:offset + limit]
+    courses = Course.objects.filter(id__in=[row[0] for row in page], published=True).select_related('instructor') \
+        .only('id', 'title', 'description', 'price', 'category', 'thumbnail', 'instructor__username')
+    courses = {course.id: course for course in courses}
+    lessons = dict(Lesson.objects.filter(id__in=[row[3] for row in page if row[3]]).values_list('id', 'title'))
+
+    results = []
+    for course_id, matched, score, lesson_id in page:
+        course = courses.get(course_id)
+        if course is None:  # unpublished or deleted since the candidates were read
+            continue
+        lesson = {'id': lesson_id, 'title': highlight(lessons[lesson_id], terms)} if lesson_id in lessons else None
+        results.append({
+            'id': course.id,
+            'title': course.title,
+            'category': course.category,
+            'price': str(course.price),
+            'instructor': course.instructor.username,
+            'thumbnail': course.thumbnail.url if course.thumbnail else None,
+            'score': score,
+            'matched_terms': matched,
+            'highlight': {
+                'title': highlight(course.title, terms),
+                'description': highlight(course.description, terms, SNIPPET_LENGTH),
+            },
+            # lesson bodies are for enrolled students, so only the lesson title is shown
+            'lesson': lesson,
+        })
+    return results, len(ranked) > offset + limit
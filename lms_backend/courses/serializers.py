@@ -1,14 +1,36 @@
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
 from rest_framework import serializers
+from . import caching, search
+from .authentication import add_user_claims
+from .conditional import is_enrolled
+from .instrumentation import TimedSerializerMixin
 from .models import Course, Lesson, Profile, Enrollment, Review
 from rest_framework.validators import UniqueValidator
 
+# resized copies of an image as {'webp': {'160': url, ...}, 'jpg': {...}}, ready for srcset
+def image_srcset(field_file, variants):
+    if not field_file or not variants:
+        return None
+    storage = field_file.storage
+    return {
+        image_format: {width: storage.url(name) for width, name in names.items()}
+        for image_format, names in variants.items()
+    }
+
 # TokenObtainPairSerializer is the default serializer used by Django REST to handle login 
 # and return: access token, refresh token
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # role/profile claims let TokenUserAuthentication skip the User and Profile queries
+        return add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
 
@@ -21,13 +43,22 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             data['role'] = self.user.profile.role
         return data
     
+# refreshing re-reads the claims, so a role change reaches the access token at the next refresh
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.select_related('profile').filter(id=refresh.get(jwt_settings.USER_ID_CLAIM)).first()
+        if user is not None:
+            add_user_claims(refresh, user)
+        return super().validate({**attrs, 'refresh': str(refresh)})
+
 # Token serializer
 class TokenSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField()
     
 # User serializer
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     email = serializers.EmailField(
         required=True,
         validators=[UniqueValidator(queryset=User.objects.all(), message="Email is already registered.")]
@@ -35,12 +66,19 @@ class UserSerializer(serializers.ModelSerializer):
     role = serializers.CharField(source='profile.role')
     profile_picture = serializers.ImageField(source='profile.profile_picture', read_only=True)
     bio = serializers.CharField(source='profile.bio', allow_blank=True, required=False)
+    picture_status = serializers.CharField(source='profile.picture_status', read_only=True)
+    profile_picture_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'password', 'role', 'profile_picture', 'bio']
+        fields = ['id', 'username', 'email', 'password', 'role', 'profile_picture', 'profile_picture_srcset',
+                  'bio', 'picture_status']
         extra_kwargs = {'password': {'write_only': True}}
 
+    def get_profile_picture_srcset(self, user):
+        profile = getattr(user, 'profile', None)
+        return image_srcset(profile.profile_picture, profile.picture_variants) if profile else None
+
     def create(self, validated_data):
         profile_data = validated_data.pop('profile', {})
         role = profile_data.get('role', 'student')  # Default role is 'student'
@@ -74,48 +112,83 @@ class UserSerializer(serializers.ModelSerializer):
 
         return instance
     
-class PublicUserSerializer(serializers.ModelSerializer):
+class PublicUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     profile_picture = serializers.ImageField(source='profile.profile_picture', read_only=True)
     role = serializers.CharField(source='profile.role', read_only=True)
     bio = serializers.CharField(source='profile.bio', read_only=True)  # Include bio here
+    profile_picture_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'profile_picture', 'role', 'bio']  # Include bio here
+        fields = ['id', 'username', 'profile_picture', 'profile_picture_srcset', 'role', 'bio']  # Include bio here
+
+    def get_profile_picture_srcset(self, user):
+        profile = getattr(user, 'profile', None)
+        return image_srcset(profile.profile_picture, profile.picture_variants) if profile else None
 
     
-class LessonSerializer(serializers.ModelSerializer): 
+class LessonSerializer(TimedSerializerMixin, serializers.ModelSerializer): 
+    # fields hidden from users who are neither enrolled nor the course instructor
+    PROTECTED_FIELDS = ('content', 'video_url')
+
     class Meta:
         model = Lesson
-        fields = ['id', 'title', 'content', 'video_url']
-        read_only_fields = ['id']  # Problem solve Mark video_url as read-only 
+        fields = ['id', 'title', 'content', 'video_url', 'video_status', 'video_size', 'video_duration', 'order']
+        read_only_fields = ['id', 'video_status', 'video_size', 'video_duration', 'order']  # Problem solve Mark video_url as read-only 
+
+    def can_view_content(self, instance):
+        request = self.context.get('request')
+        if request is None:
+            return self.context.get('enrolled', False)
+        # compare ids so checking the instructor never loads the User row
+        if request.user.id == instance.course.instructor_id:
+            return True
+        # the view may pass 'enrolled'; otherwise ask the request's enrollment set
+        enrolled = self.context.get('enrolled')
+        return is_enrolled(request, instance.course_id) if enrolled is None else enrolled
     
     def to_representation(self, instance):
-        data = super().to_representation(instance)
-        request = self.context.get('request')
-        user = request.user if request else None
-        enrolled = self.context.get('enrolled', False)  #Pass this from the view
-
-
-         # Only show content if enrolled
-        if not enrolled and user != instance.course.instructor:
-            data['content'] = None
-            data['video_url'] = None
+        # Only show content if enrolled
+        if self.can_view_content(instance):
+            return super().to_representation(instance)
 
+        # Skip the protected fields entirely so a deferred `content` is never fetched
+        data = {}
+        for field in self._readable_fields:
+            value = None if field.field_name in self.PROTECTED_FIELDS else field.get_attribute(instance)
+            data[field.field_name] = None if value is None else field.to_representation(value)
         return data
     
-class CourseSerializer(serializers.ModelSerializer):
-    lessons = LessonSerializer(many=True, read_only=True)  # Problem solve add `read_only=True`
+# what the course page shows for each lesson; the body is fetched separately
+# (LessonContentView) by users who may see it
+class LessonOutlineSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    has_video = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'has_video', 'video_duration', 'order']
+        read_only_fields = fields
+
+    def get_has_video(self, lesson):
+        return bool(lesson.video_url)
+
+class CourseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    lessons = LessonOutlineSerializer(many=True, read_only=True)  # Problem solve add `read_only=True`
     instructor = PublicUserSerializer(read_only=True)
     thumbnail = serializers.ImageField(required=False) 
+    thumbnail_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'price', 'published', 'lessons', 'instructor', 'thumbnail', 'category']
+        fields = ['id', 'title', 'description', 'price', 'published', 'lessons', 'instructor', 'thumbnail',
+                  'thumbnail_srcset', 'category']
         read_only_fields = ['instructor']  # Instructor should not be editable.
 
+    def get_thumbnail_srcset(self, course):
+        return image_srcset(course.thumbnail, course.thumbnail_variants)
+
     def update(self, instance, validated_data):
-        lessons_data = validated_data.pop('lessons', [])
+        lessons_data = validated_data.pop('lessons', None)
         instance.title = validated_data.get('title', instance.title)
         instance.description = validated_data.get('description', instance.description)
         instance.price = validated_data.get('price', instance.price)
@@ -127,37 +200,114 @@ class CourseSerializer(serializers.ModelSerializer):
         #         instance.thumbnail = validated_data['thumbnail']
         instance.save()
 
-        # Update lessons
-        existing_lessons = {lesson.id: lesson for lesson in instance.lessons.all()}
-        new_lessons = []
-
-        for lesson_data in lessons_data:
-            if 'id' in lesson_data:
-                # Update existing lesson
-                lesson = existing_lessons.pop(lesson_data['id'], None)
-                if lesson:
-                    for attr, value in lesson_data.items():
-                        setattr(lesson, attr, value)
-                    lesson.save()
-            else:
-                # Create new lesson
-                new_lessons.append(Lesson(course=instance, **lesson_data))
-
-        Lesson.objects.bulk_create(new_lessons)
-        # Delete lessons not included in the update
-        for lesson in existing_lessons.values():
-            lesson.delete()
+        # lessons are only replaced when a list is given; it also sets their order
+        if lessons_data is not None:
+            self.sync_lessons(instance, lessons_data)
 
+        # bulk writes send no post_save signal, so drop the cached course explicitly
+        caching.invalidate_course(instance.pk)
         return instance
+
+    def sync_lessons(self, course, lessons_data):
+        existing_lessons = {lesson.id: lesson for lesson in course.lessons.all()}
+        now = timezone.now()
+        changed, new_lessons, fields = [], [], {'order', 'updated_at'}
+
+        for position, lesson_data in enumerate(lessons_data):
+            lesson_data = dict(lesson_data)
+            lesson = existing_lessons.pop(lesson_data.pop('id', None), None)
+            if lesson is None:
+                new_lessons.append(Lesson(course=course, order=position, **lesson_data))
+                continue
+            for attr, value in lesson_data.items():
+                setattr(lesson, attr, value)
+            lesson.order, lesson.updated_at = position, now
+            fields.update(lesson_data)
+            changed.append(lesson)
+
+        with transaction.atomic():
+            Lesson.objects.bulk_update(changed, sorted(fields), batch_size=500)
+            Lesson.objects.bulk_create(new_lessons)
+            # Delete lessons not included in the update; update() has saved the course and
+            # drops its cache, so nothing is done per lesson
+            Lesson.objects.filter(id__in=list(existing_lessons)).only('id').delete()
+            search.index_lessons(course.lessons.only('id', 'course_id', 'title', 'content'))
     
-class EnrollmentSerializer(serializers.ModelSerializer):
+# slim serializer for the course catalog, lessons are only returned by the detail view
+class CourseListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    instructor = PublicUserSerializer(read_only=True)
+    lesson_count = serializers.IntegerField(read_only=True)
+    average_rating = serializers.FloatField(read_only=True)
+    thumbnail_srcset = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'description', 'price', 'instructor', 'thumbnail', 'thumbnail_srcset', 'category',
+                  'created_at', 'lesson_count', 'average_rating', 'rating_count', 'enrollment_count']
+        read_only_fields = fields
+
+    def get_thumbnail_srcset(self, course):
+        return image_srcset(course.thumbnail, course.thumbnail_variants)
+
+# new lesson order for a course: every lesson id exactly once
+class LessonReorderSerializer(serializers.Serializer):
+    lessons = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    def validate_lessons(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError('Lesson ids must be unique.')
+        return value
+
+# students to enroll in one go: usernames or emails (a CSV upload is read in the view)
+class BulkEnrollSerializer(serializers.Serializer):
+    students = serializers.ListField(child=serializers.CharField(max_length=254), allow_empty=False,
+                                     max_length=50000)
+
+# courses with their lessons for the JSON import, created by courses.bulk.import_courses
+class LessonImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Lesson
+        fields = ['title', 'content', 'video_url']
+
+class CourseImportSerializer(serializers.ModelSerializer):
+    lessons = LessonImportSerializer(many=True, required=False)
+
+    class Meta:
+        model = Course
+        fields = ['title', 'description', 'price', 'category', 'published', 'lessons']
+
+# direct-to-S3 lesson video uploads
+class VideoUploadStartSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=200)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(default='video/mp4')
+
+    def validate_content_type(self, value):
+        if not value.startswith('video/'):
+            raise serializers.ValidationError("Only video files can be uploaded.")
+        return value
+
+class VideoUploadPartSerializer(serializers.Serializer):
+    part_number = serializers.IntegerField(min_value=1, max_value=10000)
+    etag = serializers.CharField()
+
+class VideoUploadCompleteSerializer(serializers.Serializer):
+    upload_id = serializers.CharField()
+    key = serializers.CharField()
+    parts = VideoUploadPartSerializer(many=True, allow_empty=False)
+
+class VideoUploadAbortSerializer(serializers.Serializer):
+    upload_id = serializers.CharField()
+    key = serializers.CharField()
+
+class EnrollmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Enrollment
         fields = ['id', 'course', 'student', 'enrolled_at']
         read_only_fields = ['student', 'enrolled_at']
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     username = serializers.CharField(source='student.username', read_only=True)
     student = PublicUserSerializer(read_only=True)
 
@@ -1,16 +1,58 @@
+import hashlib
+import os
+
 from storages.backends.s3boto3 import S3Boto3Storage
 
-class PublicMediaStorage(S3Boto3Storage):
+from .aws_s3 import get_client_config, get_s3_resource, get_transfer_config
+
+# Base for our S3 storages: they all share the process-wide client from aws_s3
+# (one connection pool) and its multipart transfer settings.
+class SharedClientS3Storage(S3Boto3Storage):
+    def __init__(self, **settings):
+        settings.setdefault('client_config', get_client_config())
+        settings.setdefault('transfer_config', get_transfer_config())
+        super().__init__(**settings)
+
+    @property
+    def connection(self):
+        # one resource per thread like S3Boto3Storage, all on the shared (thread-safe) client
+        connection = getattr(self._connections, 'connection', None)
+        if connection is None:
+            connection = self._connections.connection = get_s3_resource()
+        return connection
+
+# Adds a hash of the file's content to its name (photo.png -> photo.3f2a9c1b0d4e.png).
+# A name then always refers to the same bytes, so browsers and CDNs may cache it forever
+# and a new upload automatically gets a new url.
+class ContentHashedNameMixin:
+    hash_length = 12
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        root, ext = os.path.splitext(name)
+        return super().save(f'{root}.{digest.hexdigest()[:self.hash_length]}{ext}', content, max_length)
+
+# long-lived caching for content-hashed images
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+class PublicMediaStorage(SharedClientS3Storage):
     location = 'media'  # or 'thumbnails' or whatever S3 subfolder you want
     default_acl = 'public-read'
 
     
-class PublicProfilePicStorage(S3Boto3Storage):
+class PublicProfilePicStorage(ContentHashedNameMixin, SharedClientS3Storage):
     location = 'profile_pics'
     default_acl = 'public-read'
     file_overwrite = False
+    object_parameters = {'CacheControl': IMMUTABLE_CACHE_CONTROL}
 
-class PublicThumbnailStorage(S3Boto3Storage):
+class PublicThumbnailStorage(ContentHashedNameMixin, SharedClientS3Storage):
     location = 'course_thumbnails'
     default_acl = 'public-read'
-    file_overwrite = False
\ No newline at end of file
+    file_overwrite = False
+    object_parameters = {'CacheControl': IMMUTABLE_CACHE_CONTROL}
\ No newline at end of file
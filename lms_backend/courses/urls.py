@@ -1,25 +1,40 @@
+from django.conf import settings
 from django.urls import path
 from .views import CategoryChoicesView, CourseDetailView, CourseList, CourseReviewListCreateView, EnrollInCourseView, EnrolledCoursesView, InstructorCourseDeleteView, InstructorCoursesView, LessonList, CreateCourseView, LessonCreateView, LessonUpdateView, ProfilePictureUploadView, ToggleCoursePublishView, UserProfileView
-from .views import RegisterUserView, instructor_stats
-from rest_framework_simplejwt.views import  TokenRefreshView #, TokenObtainPairView
-from .views import CustomTokenObtainPairView 
+from .views import BulkEnrollView, CacheStatsView, CourseImportView, CourseSearchView, StudentRecommendationsView, ExportView, LessonContentView, LessonReorderView, MetricsView, LessonVideoUploadCompleteView, LessonVideoUploadView, RegisterUserView, instructor_stats
+from .views import CustomTokenObtainPairView, CustomTokenRefreshView
 
 urlpatterns = [
     path('courses/', CourseList.as_view(), name='course-list'),
     path('courses/create/', CreateCourseView.as_view(), name='create-course'), 
+    # JSON import of courses with their lessons (instructors)
+    path('courses/import/', CourseImportView.as_view(), name='course-import'),
+    # ranked full text search over published courses and their lessons
+    path('courses/search/', CourseSearchView.as_view(), name='course-search'),
     path('courses/<int:course_id>/', CourseDetailView.as_view(), name='course-detail'),
     # lesson create path
     path('courses/<int:course_id>/lessons/', LessonCreateView.as_view(), name='lesson-create'),
+    # new lesson order for a course (instructors)
+    path('courses/<int:course_id>/lessons/reorder/', LessonReorderView.as_view(), name='lesson-reorder'),
     # enrollment path
     path('courses/<int:course_id>/enroll/', EnrollInCourseView.as_view(), name='enroll-course'),
+    # cohort enrollment from a list or CSV (instructor or admin)
+    path('courses/<int:course_id>/enroll/bulk/', BulkEnrollView.as_view(), name='bulk-enroll'),
+    # streamed roster/review downloads for the instructor
+    path('courses/<int:course_id>/export/roster/', ExportView.as_view(), {'kind': 'roster'}, name='course-roster-export'),
+    path('courses/<int:course_id>/export/reviews/', ExportView.as_view(), {'kind': 'reviews'}, name='course-reviews-export'),
     # review path 
     path('courses/<int:course_id>/reviews/', CourseReviewListCreateView.as_view(), name='course-reviews'),
     # Adding “My Courses” path for students
     path('student/courses/', EnrolledCoursesView.as_view(), name='enrolled-courses'),
+    # "recommended for you" from the enrollment graph
+    path('student/recommendations/', StudentRecommendationsView.as_view(), name='student-recommendations'),
     
     # Adding “My Courses” path for instructors
     path('instructor/courses/', InstructorCoursesView.as_view(), name='instructor-courses'),
     path('instructor/courses/<int:course_id>/delete/', InstructorCourseDeleteView.as_view(), name='instructor-course-delete'),
+    # enrollments across all of the instructor's courses as CSV/NDJSON
+    path('instructor/export/enrollments/', ExportView.as_view(), {'kind': 'enrollments'}, name='enrollments-export'),
     
     # path for instructor stats
     path('instructor-stats/', instructor_stats, name='instructor-stats'),
@@ -33,13 +48,39 @@ urlpatterns = [
     # adding lesson list and update path for instructors
     path('lessons/', LessonList.as_view(), name='lesson-list'),
     path('lessons/<int:pk>/', LessonUpdateView.as_view(), name='lesson-update'),
+    # lesson body for enrolled students and the instructor (the course detail only has the outline)
+    path('lessons/<int:pk>/content/', LessonContentView.as_view(), name='lesson-content'),
+    # direct-to-S3 video upload paths for instructors
+    path('lessons/<int:pk>/video-upload/', LessonVideoUploadView.as_view(), name='lesson-video-upload'),
+    path('lessons/<int:pk>/video-upload/complete/', LessonVideoUploadCompleteView.as_view(), name='lesson-video-upload-complete'),
     # adding path for registering a new user
     path('register/', RegisterUserView.as_view(), name='register'),
     # Adding the path for the token obtain pair view   
     path('token/', CustomTokenObtainPairView.as_view(), name='token-obtain'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     # path for the category choices API
     path('categories/', CategoryChoicesView.as_view(), name='category-choices'),
+    # cache hit/miss counters for admins
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
+    # request metrics in Prometheus format for admins
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     
    
 ]
+
+# under ASGI the hot read endpoints are served by async views (same paths and names);
+# they hand writes back to the DRF views above
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views
+
+    ASYNC_VIEWS = {
+        'course-list': async_views.course_list,
+        'course-detail': async_views.course_detail,
+        'course-reviews': async_views.course_reviews,
+        'enrolled-courses': async_views.enrolled_courses,
+    }
+    urlpatterns = [
+        path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+        if pattern.name in ASYNC_VIEWS else pattern
+        for pattern in urlpatterns
+    ]
@@ -1,3 +1,5 @@
+import csv
+import logging
 from io import BytesIO
 import traceback
 from django.conf import settings
@@ -7,33 +9,54 @@ from rest_framework import generics, permissions
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 import urllib
 from .models import Course, Lesson, Profile, Enrollment, Review
-from .serializers import CourseSerializer, CustomTokenObtainPairSerializer, LessonSerializer, EnrollmentSerializer, ReviewSerializer
+from . import bulk, caching, exports, jobs, recommendations, search
+from .analytics import instructor_analytics
+from .authentication import user_role
+from .conditional import course_detail_condition, course_reviews_condition, enrolled_course_ids, is_enrolled, profile_condition
+from .db.routers import replica_reads
+from .filters import CourseCatalogFilter, CourseOrderingFilter
+from .instrumentation import prometheus_metrics
+from .pagination import CourseCursorPagination
+from .serializers import CourseListSerializer, CourseSerializer, CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, LessonSerializer, EnrollmentSerializer, ReviewSerializer
 
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
-from .serializers import UserSerializer, TokenSerializer
+from .serializers import UserSerializer, TokenSerializer, image_srcset
+from .serializers import BulkEnrollSerializer, CourseImportSerializer, LessonOutlineSerializer, LessonReorderSerializer
+from .serializers import VideoUploadAbortSerializer, VideoUploadCompleteSerializer, VideoUploadStartSerializer
 from django.contrib.auth.models import User
 
-from rest_framework.permissions import IsAuthenticated, BasePermission
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, BasePermission
 from .serializers import CourseSerializer
 from rest_framework.permissions import AllowAny
-from django.db import IntegrityError
-
-from django.http import JsonResponse
-from .aws_s3 import upload_to_s3
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+
+from django.http import HttpResponse, JsonResponse
+from .aws_s3 import abort_multipart_upload, complete_multipart_upload, start_multipart_upload, upload_to_s3
+from botocore.exceptions import BotoCoreError, ClientError
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+import uuid
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 from django.core.files.uploadedfile import TemporaryUploadedFile
 from rest_framework.generics import RetrieveUpdateAPIView, RetrieveUpdateDestroyAPIView
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from rest_framework.decorators import api_view, permission_classes
+from django.utils.decorators import method_decorator
+from django.views.decorators.vary import vary_on_headers
 from rest_framework import serializers
+from rest_framework.utils.urls import replace_query_param
+
+logger = logging.getLogger(__name__)
 
 class IsInstructor(BasePermission):
     def has_permission(self, request, view):
-        return hasattr(request.user, 'profile') and request.user.profile.role == 'instructor'
+        return user_role(request.user) == 'instructor'
 
 #view for showing categories so I don't have to rewrite them in the frontend
 class CategoryChoicesView(APIView):
@@ -47,14 +70,34 @@ class CategoryChoicesView(APIView):
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
 # view for listing courses
 class CourseList(generics.ListCreateAPIView):
     serializer_class = CourseSerializer
     permission_classes = [AllowAny] 
+    pagination_class = CourseCursorPagination
+    filter_backends = [CourseCatalogFilter, CourseOrderingFilter]
+
+    def get_serializer_class(self):
+        # the catalog uses the slim form, CourseDetailView returns the nested lessons
+        if self.request.method == 'GET':
+            return CourseListSerializer
+        return CourseSerializer
     
     def get_queryset(self):
-            user = self.request.user
-            return Course.objects.filter(published=True)  # Everyone else sees only published
+            return Course.objects.published().for_listing()  # Everyone else sees only published
+
+    @method_decorator(replica_reads)
+    def list(self, request, *args, **kwargs):
+        # catalog pages are the same for every user, cache them by url
+        key = caching.catalog_page_key(request)
+        data = caching.get_cached(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            caching.set_catalog_page(key, data)
+        return Response(data)
 
 # view for showing lessons in a course
 class LessonList(generics.ListCreateAPIView):
@@ -70,7 +113,21 @@ class CreateCourseView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         # Automatically set the instructor to the authenticated user
-        serializer.save(instructor=self.request.user)
+        course = serializer.save(instructor_id=self.request.user.id)
+        if course.thumbnail:
+            jobs.enqueue('course_thumbnail', course.id)
+
+# view for instructors to import courses with their lessons from JSON
+class CourseImportView(APIView):
+    permission_classes = [IsAuthenticated, IsInstructor]
+
+    def post(self, request):
+        courses = request.data.get('courses') if isinstance(request.data, dict) else request.data
+        serializer = CourseImportSerializer(data=courses, many=True, allow_empty=False)
+        if not serializer.is_valid():
+            return Response({'courses': serializer.errors}, status=400)
+        created = bulk.import_courses(request.user.id, serializer.validated_data)
+        return Response({'courses': created}, status=status.HTTP_201_CREATED)
 
 # view for registering users
 class RegisterUserView(APIView):
@@ -112,36 +169,39 @@ class CourseDetailView(APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
     parser_classes = [MultiPartParser, FormParser]  # To handle file uploads
 
+    # unchanged courses are answered with 304 from their ETag before serializing
+    @method_decorator(replica_reads)
+    @method_decorator(vary_on_headers('Authorization'))
+    @course_detail_condition
     def get(self, request, course_id):
+        # Only check enrollment if user is authenticated (shared with the ETag check)
+        enrolled = is_enrolled(request, course_id)
+
+        # published courses are cached (the lesson outline is the same for everyone),
+        # the instructor always gets a fresh copy
+        cached = caching.get_cached(caching.course_detail_key(course_id))
+        if cached is not None and cached['instructor_id'] != request.user.id:
+            return Response({**cached['data'], 'is_enrolled': enrolled})
+
         try:
-            course = Course.objects.get(id=course_id)
+            course = Course.objects.for_catalog().get(id=course_id)
             
             # Hide unpublished courses from everyone except the instructor
-            if not course.published and course.instructor != request.user:
+            if not course.published and course.instructor_id != request.user.id:
                 return Response({'error': 'Course not found'}, status=404)
-           
-            # Only check enrollment if user is authenticated
-            enrolled = False
-            
-            if request.user.is_authenticated:
-               enrolled = Enrollment.objects.filter(course=course, student=request.user).exists()
 
             serializer = CourseSerializer(
                 course,
                 context={'request': request, 'enrolled': enrolled}
             )
         
-            course_data = serializer.data
-            course_data['is_enrolled'] = enrolled 
+            # "students who took this also took", cached with the rest of the payload
+            course_data = {**serializer.data, 'also_taken': recommendations.also_taken(course.id)}
 
+            if course.published and course.instructor_id != request.user.id:
+                caching.set_course_detail(course.id, course.instructor_id, course_data)
 
-            # If not enrolled, hide content and videos
-            if not enrolled and course.instructor != request.user:
-                for lesson in course_data.get('lessons', []):
-                    lesson['content'] = 'Enroll to see the content'
-                    lesson['video_url'] = None
-
-            return Response(course_data)
+            return Response({**course_data, 'is_enrolled': enrolled})
         
         except Course.DoesNotExist:
             return Response({'error': 'Course not found'}, status=404)
@@ -151,12 +211,14 @@ class CourseDetailView(APIView):
         try:
             course = Course.objects.get(id=course_id)
 
-            if course.instructor != request.user:
+            if course.instructor_id != request.user.id:
                 return Response({'error': 'Unauthorized'}, status=403)
 
             serializer = CourseSerializer(course, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
+                if 'thumbnail' in serializer.validated_data:
+                    jobs.enqueue('course_thumbnail', course.id)  # resized variants are made off the request
                 return Response(serializer.data)
             else:
                 return Response(serializer.errors, status=400)
@@ -174,7 +236,6 @@ class LessonCreateView(APIView):
         content = request.data.get('content')
         video = request.FILES.get('video')
         course = Course.objects.get(pk=course_id)
-        is_enrolled = course.students.filter(id=request.user.id).exists()
        
         video_url = None
         # Upload video to S3
@@ -184,17 +245,19 @@ class LessonCreateView(APIView):
             if not video_url:
                 return Response({"error": "Failed to upload video."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        last = Lesson.objects.filter(course_id=course_id).aggregate(last=Max('order'))['last']
         lesson = Lesson.objects.create(
             title=title,
             content=content,
             course_id=course_id,
             video_url=video_url,# this will be None if no video
+            order=0 if last is None else last + 1,  # new lessons go to the end
         )
+        if video_url:
+            jobs.enqueue('lesson_video', lesson.id)
+            lesson.refresh_from_db(fields=['video_status'])
 
-        serializer = LessonSerializer(lesson, context={
-            'request': request,
-            'enrolled': is_enrolled,
-        })
+        serializer = LessonSerializer(lesson, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
 # view for instructors to update their lessons
@@ -208,10 +271,8 @@ class LessonUpdateView(RetrieveUpdateDestroyAPIView):
     def put(self, request, pk):
         try:
             lesson = Lesson.objects.get(id=pk)
-            is_enrolled = Enrollment.objects.filter(student=request.user, course=lesson.course).exists()
-            
 
-            if lesson.course.instructor != request.user:
+            if lesson.course.instructor_id != request.user.id:
                 return Response({'error': 'Unauthorized'}, status=403)
 
             # Update title and content
@@ -224,6 +285,7 @@ class LessonUpdateView(RetrieveUpdateDestroyAPIView):
             
             if remove_video:
                 lesson.video_url = None  # just clear it
+                lesson.video_status, lesson.video_size, lesson.video_duration = 'none', None, None
             elif video_file:
                 file_name = f'{lesson.course.id}/{video_file.name}'
                 try:
@@ -237,11 +299,11 @@ class LessonUpdateView(RetrieveUpdateDestroyAPIView):
 
             # Save the updated lesson
             lesson.save()
+            if video_file and not remove_video:
+                jobs.enqueue('lesson_video', lesson.id)
+                lesson.refresh_from_db(fields=['video_status'])
             
-            serializer = LessonSerializer(lesson, context={
-                'request': request,
-                'enrolled': is_enrolled,  # your logic
-            })
+            serializer = LessonSerializer(lesson, context={'request': request})
             return Response(serializer.data)
 
         except Lesson.DoesNotExist:
@@ -250,16 +312,158 @@ class LessonUpdateView(RetrieveUpdateDestroyAPIView):
             print(f"Error updating lesson: {str(e)}")
             return Response({'error': 'An error occurred while updating the lesson.'}, status=500)
 
+# lookup shared by the video upload views, only the course instructor may upload
+class LessonInstructorMixin:
+    def get_lesson(self, request, pk):
+        lesson = Lesson.objects.select_related('course').filter(id=pk).first()
+        if lesson is None:
+            return None, Response({'error': 'Lesson not found'}, status=404)
+        if lesson.course.instructor_id != request.user.id:
+            return None, Response({'error': 'Unauthorized'}, status=403)
+        return lesson, None
+
+# view for a lesson's body (content and video) for enrolled students and the instructor;
+# ?next=N also returns the following N lessons so the player can prefetch them
+class LessonContentView(APIView):
+    permission_classes = [IsAuthenticated]
+    MAX_NEXT = 20
+
+    def get(self, request, pk):
+        lesson = Lesson.objects.select_related('course').filter(id=pk).first()
+        if lesson is None:
+            return Response({'error': 'Lesson not found'}, status=404)
+        course = lesson.course
+        if course.instructor_id != request.user.id and not is_enrolled(request, course.id):
+            return Response({'error': 'Enroll to see the content'}, status=403)
+
+        try:
+            next_count = min(max(int(request.query_params.get('next', 0)), 0), self.MAX_NEXT)
+        except ValueError:
+            return Response({'error': 'next must be a number.'}, status=400)
+        following = []
+        if next_count:
+            after = Q(order__gt=lesson.order) | Q(order=lesson.order, id__gt=lesson.id)
+            following = list(Lesson.objects.filter(after, course_id=course.id)[:next_count])
+            for other in following:
+                other.course = course  # the serializer checks course.instructor_id
+
+        context = {'request': request, 'enrolled': True}
+        return Response({
+            'lesson': LessonSerializer(lesson, context=context).data,
+            'next': LessonSerializer(following, many=True, context=context).data,
+        })
+
+# view for instructors to reorder all lessons of a course in one UPDATE,
+# body: {"lessons": [lesson ids in the new order]}
+class LessonReorderView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, course_id):
+        course = Course.objects.filter(id=course_id).first()
+        if course is None:
+            return Response({'error': 'Course not found'}, status=404)
+        if course.instructor_id != request.user.id:
+            return Response({'error': 'Unauthorized'}, status=403)
+        serializer = LessonReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lesson_ids = serializer.validated_data['lessons']
+
+        with transaction.atomic():
+            lessons = Lesson.objects.select_for_update().filter(course_id=course.id)
+            if set(lessons.values_list('id', flat=True)) != set(lesson_ids):
+                return Response({'error': 'Send every lesson of the course exactly once.'}, status=400)
+            lessons.update(order=Case(
+                *[When(id=lesson_id, then=Value(position)) for position, lesson_id in enumerate(lesson_ids)],
+                output_field=IntegerField(),
+            ), updated_at=timezone.now())
+            # update() sends no signals: bump the course for its ETag and drop cached copies
+            Course.objects.filter(pk=course.pk).update(updated_at=timezone.now())
+        caching.invalidate_course(course.id)
+
+        outline = LessonOutlineSerializer(Lesson.objects.filter(course_id=course.id), many=True)
+        return Response(outline.data)
+
+# views for uploading lesson videos straight to S3 with presigned multipart urls:
+# POST starts the upload and returns one presigned url per part, DELETE aborts it
+class LessonVideoUploadView(LessonInstructorMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        lesson, error = self.get_lesson(request, pk)
+        if error:
+            return error
+        serializer = VideoUploadStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        file_name = f'{lesson.course_id}/{uuid.uuid4().hex}/{get_valid_filename(data["filename"])}'
+        try:
+            upload = start_multipart_upload(
+                settings.AWS_STORAGE_BUCKET_NAME, file_name, data['size'], data['content_type']
+            )
+        except (BotoCoreError, ClientError):
+            logger.exception("Error starting video upload for lesson %s", lesson.id)
+            return Response({'error': 'Failed to start video upload.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(upload, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, pk):
+        lesson, error = self.get_lesson(request, pk)
+        if error:
+            return error
+        serializer = VideoUploadAbortSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if not data['key'].startswith(f'{lesson.course_id}/'):
+            return Response({'error': 'Invalid upload key.'}, status=400)
+
+        try:
+            abort_multipart_upload(settings.AWS_STORAGE_BUCKET_NAME, data['key'], data['upload_id'])
+        except (BotoCoreError, ClientError):
+            logger.exception("Error aborting video upload for lesson %s", lesson.id)
+            return Response({'error': 'Failed to abort video upload.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+# completes the multipart upload and attaches the video to the lesson
+class LessonVideoUploadCompleteView(LessonInstructorMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        lesson, error = self.get_lesson(request, pk)
+        if error:
+            return error
+        serializer = VideoUploadCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        # keys are generated by LessonVideoUploadView under the course folder
+        if not data['key'].startswith(f'{lesson.course_id}/'):
+            return Response({'error': 'Invalid upload key.'}, status=400)
+
+        try:
+            video_url = complete_multipart_upload(
+                settings.AWS_STORAGE_BUCKET_NAME, data['key'], data['upload_id'], data['parts']
+            )
+        except (BotoCoreError, ClientError):
+            logger.exception("Error completing video upload for lesson %s", lesson.id)
+            return Response({'error': 'Failed to complete video upload.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lesson.video_url = video_url
+        lesson.save()
+        jobs.enqueue('lesson_video', lesson.id)  # records size and duration off the request
+        lesson.refresh_from_db(fields=['video_status'])
+        serializer = LessonSerializer(lesson, context={'request': request})
+        return Response(serializer.data)
+
 # view for instructors to see their courses "My courses"   
 class InstructorCoursesView(APIView):
     permission_classes = [IsAuthenticated, IsInstructor]
 
     def get(self, request):
         # Get all courses where the instructor is the current user
-        courses = Course.objects.filter(instructor=request.user)
+        courses = Course.objects.filter(instructor_id=request.user.id)
         course_data = [
             {'id': course.id, 'title': course.title, 'description': course.description,
               'thumbnail': course.thumbnail.url if course.thumbnail else None,'published': course.published,
+              'thumbnail_srcset': image_srcset(course.thumbnail, course.thumbnail_variants),
             }
             for course in courses
         ]
@@ -269,11 +473,17 @@ class InstructorCoursesView(APIView):
 class UserProfileView(RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]  # edits the User row itself
 
     def get_object(self):
         # Return the authenticated user
         return self.request.user
 
+    @method_decorator(vary_on_headers('Authorization'))
+    @profile_condition
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 # view for students to enroll in courses
 class EnrollInCourseView(APIView):
     permission_classes = [IsAuthenticated]
@@ -281,16 +491,52 @@ class EnrollInCourseView(APIView):
     def post(self, request, course_id):
         user = request.user
         course = Course.objects.get(id=course_id)
-        enrollment, created = Enrollment.objects.get_or_create(student=request.user, course=course)    
-        
-        
-        if user.profile.role == 'instructor': # Check if the user is an instructor
+
+        if user_role(user) == 'instructor': # Check if the user is an instructor
             return Response({'detail': 'Instructors cannot enroll in courses.'}, status=status.HTTP_403_FORBIDDEN)
+        if is_enrolled(request, course.id):
+            return Response({'message': 'Already enrolled'})
+
+        with transaction.atomic():
+            enrollment, created = Enrollment.objects.get_or_create(student_id=request.user.id, course=course)
+            if created:
+                Course.objects.filter(pk=course.pk).update(enrollment_count=F('enrollment_count') + 1)
                 
         if created:
             return Response({'message': 'Enrolled successfully'})
         else:
             return Response({'message': 'Already enrolled'})
+
+# view for instructors/admins to enroll a whole cohort: a JSON list of usernames/emails
+# or a CSV upload, answered with a status for every row
+class BulkEnrollView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def post(self, request, course_id):
+        course = Course.objects.filter(id=course_id).only('id', 'instructor_id').first()
+        if course is None:
+            return Response({'error': 'Course not found'}, status=404)
+        if course.instructor_id != request.user.id and not request.user.is_staff:
+            return Response({'error': 'Only the instructor can enroll students'}, status=403)
+
+        upload = request.FILES.get('file')
+        if upload is not None:
+            try:
+                students = bulk.identifiers_from_csv(upload)
+            except (UnicodeDecodeError, csv.Error):
+                return Response({'error': 'The file must be a UTF-8 CSV.'}, status=400)
+            if not students:
+                return Response({'error': 'The file has no usernames or emails.'}, status=400)
+        else:
+            serializer = BulkEnrollSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=400)
+            students = serializer.validated_data['students']
+
+        result = bulk.bulk_enroll(course, students)
+        caching.invalidate_course(course.id)
+        return Response(result)
         
 # view for showing reviews for a course and allowing students to leave reviews
 class CourseReviewListCreateView(generics.ListCreateAPIView):
@@ -299,25 +545,88 @@ class CourseReviewListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         course_id = self.kwargs['course_id']
-        return Review.objects.filter(course__id=course_id)
+        # each review embeds the reviewer's public profile
+        return Review.objects.filter(course__id=course_id).select_related('student__profile')
+
+    @method_decorator(replica_reads)
+    @course_reviews_condition
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         course_id = self.kwargs['course_id']
         user = self.request.user
         # Ensure user is enrolled
-        if not Enrollment.objects.filter(course_id=course_id, student=user).exists():
+        if not is_enrolled(self.request, course_id):
             raise serializers.ValidationError("You must be enrolled to leave a review.")
-        serializer.save(course_id=course_id, student=user)
+        with transaction.atomic():
+            review = serializer.save(course_id=course_id, student_id=user.id)
+            Course.objects.filter(pk=course_id).update(
+                rating_sum=F('rating_sum') + review.rating,
+                rating_count=F('rating_count') + 1,
+            )
+
+# view for searching published courses and their lessons:
+# ?q=python basics&page=2&page_size=20, best matches first with the terms highlighted
+class CourseSearchView(APIView):
+    permission_classes = [AllowAny]
+    max_page_size = 50
+    max_page = 50
+
+    @method_decorator(replica_reads)
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not search.query_terms(query):
+            return Response({'error': 'A search query is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = int(request.query_params.get('page', 1))
+            page_size = min(int(request.query_params.get('page_size', 20)), self.max_page_size)
+        except ValueError:
+            return Response({'error': 'page and page_size must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= page <= self.max_page or page_size < 1:
+            return Response({'error': f'page must be between 1 and {self.max_page}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results, has_next = search.search(query, (page - 1) * page_size, page_size)
+        url = request.build_absolute_uri()
+        return Response({
+            'query': query,
+            'page': page,
+            'next': replace_query_param(url, 'page', page + 1) if has_next and page < self.max_page else None,
+            'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+            'results': results,
+        })
+
+# view for "recommended for you": courses close to the user's enrolled courses in the
+# enrollment graph (?limit=1..50, default 10), the most popular courses for new users
+class StudentRecommendationsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @method_decorator(replica_reads)
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({'error': 'limit must be a number.'}, status=status.HTTP_400_BAD_REQUEST)
+        courses = recommendations.for_student(enrolled_course_ids(request), limit)
+        return Response([
+            {'id': course.id, 'title': course.title, 'description': course.description,
+             'thumbnail': course.thumbnail.url if course.thumbnail else None,
+             'thumbnail_srcset': image_srcset(course.thumbnail, course.thumbnail_variants),
+             'score': getattr(course, 'score', None)}
+            for course in courses
+        ])
 
 # view for students to see their enrolled courses "My courses"
 class EnrolledCoursesView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(replica_reads)
     def get(self, request):
-        user = request.user
-        enrolled_courses = Course.objects.filter(students=user, published=True)
+        enrolled_courses = Course.objects.filter(id__in=enrolled_course_ids(request), published=True)
         course_data = [
-            {'id': course.id, 'title': course.title, 'description': course.description, 'thumbnail': course.thumbnail.url if course.thumbnail else None}
+            {'id': course.id, 'title': course.title, 'description': course.description, 'thumbnail': course.thumbnail.url if course.thumbnail else None,
+             'thumbnail_srcset': image_srcset(course.thumbnail, course.thumbnail_variants)}
             for course in enrolled_courses
         ]
         return Response(course_data)
@@ -326,12 +635,18 @@ class ProfilePictureUploadView(APIView):
 
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]  # edits the user's Profile row
 
     def patch(self, request):
         profile = request.user.profile
         profile.profile_picture = request.FILES.get('profile_picture')
         profile.save()
-        return Response({'profile_picture': profile.profile_picture.url})
+        # resizing happens in the media worker, the client can poll picture_status
+        jobs.enqueue('profile_picture', profile.id)
+        return Response({
+            'profile_picture': profile.profile_picture.url if profile.profile_picture else None,
+            'picture_status': 'pending',
+        })
 
 # view for instructors to delete their courses   
 class InstructorCourseDeleteView(APIView):
@@ -339,7 +654,7 @@ class InstructorCourseDeleteView(APIView):
 
     def delete(self, request, course_id):
         try:
-            course = Course.objects.get(id=course_id, instructor=request.user)
+            course = Course.objects.get(id=course_id, instructor_id=request.user.id)
             course.delete()
             return Response({'message': 'Course deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
         except Course.DoesNotExist:
@@ -351,7 +666,7 @@ class ToggleCoursePublishView(APIView):
 
     def post(self, request, course_id):
         try:
-            course = Course.objects.get(id=course_id, instructor=request.user)
+            course = Course.objects.get(id=course_id, instructor_id=request.user.id)
             course.published = not course.published
             course.save()
             return Response({'published': course.published}, status=status.HTTP_200_OK)
@@ -362,14 +677,59 @@ class ToggleCoursePublishView(APIView):
 @permission_classes([IsAuthenticated])
 def instructor_stats(request):
     user = request.user
-    if user.profile.role != 'instructor':
+    if user_role(user) != 'instructor':
         return Response({'detail': 'Not authorized'}, status=403)
 
-    courses = Course.objects.filter(instructor=user)
-    total_courses = courses.count()
-    total_enrollments = Enrollment.objects.filter(course__in=courses).count()
+    # per-course numbers and a daily enrollment series (?days=1..365, default 30)
+    try:
+        days = min(max(int(request.query_params.get('days', 30)), 1), 365)
+    except ValueError:
+        return Response({'error': 'days must be a number.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(instructor_analytics(user, days))
+
+# streamed CSV/NDJSON downloads for instructors: a course's roster or reviews, or the
+# enrollments across all their courses (?output=csv|ndjson, ?since/?until=YYYY-MM-DD)
+class ExportView(APIView):
+    permission_classes = [IsAuthenticated]
 
-    return Response({
-        'total_courses': total_courses,
-        'total_enrollments': total_enrollments,
-    })
\ No newline at end of file
+    def get(self, request, kind, course_id=None):
+        output = request.query_params.get('output', 'csv')
+        if output not in exports.OUTPUTS:
+            return Response({'error': 'output must be csv or ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = exports.parse_date_range(request.query_params.get('since'),
+                                                  request.query_params.get('until'))
+        except ValueError:
+            return Response({'error': 'since and until must be dates (YYYY-MM-DD).'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if course_id is None:
+            if user_role(request.user) != 'instructor':
+                return Response({'detail': 'Not authorized'}, status=403)
+            queryset = exports.export_queryset(kind, start, end, course__instructor_id=request.user.id)
+            filename = f'{kind}-{timezone.localdate()}'
+        else:
+            instructor_id = Course.objects.filter(id=course_id).values_list('instructor_id', flat=True).first()
+            if instructor_id is None:
+                return Response({'error': 'Course not found'}, status=404)
+            if instructor_id != request.user.id and not request.user.is_staff:
+                return Response({'error': 'Only the instructor can export this course'}, status=403)
+            queryset = exports.export_queryset(kind, start, end, course_id=course_id)
+            filename = f'course-{course_id}-{kind}-{timezone.localdate()}'
+        return exports.stream_export(kind, queryset, output, filename)
+
+# cache hit/miss counters for sizing the course cache (admin only)
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(caching.cache_stats())
+
+
+# view for the request metrics collected by RequestMetricsMiddleware (Prometheus text format)
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(prometheus_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
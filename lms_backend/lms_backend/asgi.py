@@ -9,8 +9,30 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from asgiref.wsgi import WsgiToAsgi
+from django.conf import settings
 from django.core.asgi import get_asgi_application
+from whitenoise import WhiteNoise
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms_backend.settings')
+# serve the hot read endpoints with the async views in courses/async_views.py
+os.environ.setdefault('ASYNC_READ_VIEWS', 'true')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+def not_found(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'Not Found']
+
+
+# WhiteNoise's middleware is sync-only and would send every request through a thread,
+# so under ASGI it only sees /static/ (the admin's assets)
+static_application = WsgiToAsgi(WhiteNoise(not_found, root=settings.STATIC_ROOT, prefix=settings.STATIC_URL))
+static_prefix = '/' + settings.STATIC_URL.lstrip('/')
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'].startswith(static_prefix):
+        return await static_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -17,9 +17,6 @@ env.read_env()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-import pymysql
-pymysql.install_as_MySQLdb()
-
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 # SECURITY WARNING: keep the secret key used in production secret!
@@ -81,6 +78,16 @@ AWS_S3_FILE_OVERWRITE = False  # Prevent overwriting files with same name
 AWS_DEFAULT_ACL = 'public-read'         # Make files public by default 
 AWS_QUERYSTRING_AUTH = False   # Remove ?AWSAccessKeyId=... from URLs
 
+# S3 client pool and transfer tuning (courses/aws_s3.py)
+AWS_S3_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_S3_MAX_POOL_CONNECTIONS', 50))
+AWS_S3_MULTIPART_THRESHOLD = int(os.environ.get('AWS_S3_MULTIPART_THRESHOLD', 16 * 1024 * 1024))
+AWS_S3_MULTIPART_CHUNKSIZE = int(os.environ.get('AWS_S3_MULTIPART_CHUNKSIZE', 16 * 1024 * 1024))
+AWS_S3_MAX_CONCURRENCY = int(os.environ.get('AWS_S3_MAX_CONCURRENCY', 10))
+
+# Direct-to-S3 lesson video uploads (presigned multipart)
+AWS_UPLOAD_PART_SIZE = int(os.environ.get('AWS_UPLOAD_PART_SIZE', 64 * 1024 * 1024))
+AWS_PRESIGNED_URL_EXPIRY = int(os.environ.get('AWS_PRESIGNED_URL_EXPIRY', 60 * 60))  # seconds
+
 # Media files settings
 MEDIA_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/'
 
@@ -97,6 +104,8 @@ CORS_ALLOWED_ORIGINS = [
 
 
 MIDDLEWARE = [
+    # per-endpoint latency and query metrics, see courses/instrumentation.py
+    'courses.instrumentation.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
 
     'django.middleware.security.SecurityMiddleware',
@@ -107,10 +116,18 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # keeps users on the primary database for a while after they write (courses/db/routers.py)
+    'courses.db.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# async views for the hot read endpoints (turned on by asgi.py, see courses/async_views.py)
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'false').lower() == 'true'
+if ASYNC_READ_VIEWS:
+    # every other middleware runs natively async; asgi.py serves /static/ itself
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 ROOT_URLCONF = 'lms_backend.urls'
 
 TEMPLATES = [
@@ -149,6 +166,137 @@ DATABASES = {
     }
 }
 
+# MySQL driver: 'pymysql' (pure Python) or 'mysqlclient' (the C extension, faster;
+# needs the MySQL client libraries at build time)
+MYSQL_DRIVER = os.environ.get('MYSQL_DRIVER', 'pymysql')
+if MYSQL_DRIVER == 'pymysql':
+    import pymysql
+    pymysql.install_as_MySQLdb()
+
+# How connections are reused (DB_CONNECTIONS):
+# 'pool'       - a connection pool per process (courses/db/pool.py); works under WSGI and ASGI
+# 'persistent' - Django's persistent connections, one per thread, kept DB_CONN_MAX_AGE
+#                seconds; WSGI only (Django recommends against them under ASGI)
+# 'close'      - a new connection for every request
+DB_CONNECTIONS = os.environ.get('DB_CONNECTIONS', 'pool')
+if DB_CONNECTIONS == 'pool':
+    DATABASES['default']['ENGINE'] = 'courses.db.mysql'
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),  # open connections per process
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),  # seconds to wait for a free one
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+        'check_after': float(os.environ.get('DB_POOL_CHECK_AFTER', 30)),  # ping when idle this long
+    }
+elif DB_CONNECTIONS == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Read replicas: MYSQL_REPLICA_HOSTS=host1,host2 adds the aliases replica1, replica2 with
+# the primary's settings. The catalog, course detail, review list and enrolled courses
+# read from them (courses/db/routers.py).
+REPLICA_DATABASES = []
+for number, host in enumerate(filter(None, os.environ.get('MYSQL_REPLICA_HOSTS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+# SQLite file instead of MySQL, for local runs, tests and benchmarks (e.g. SQLITE_PATH=bench.sqlite3).
+# 'replica' opens the same file as a stand-in read replica, used with SQLITE_REPLICA=true;
+# test runs get a separate database for it (see ReplicaRoutingTests)
+if os.environ.get('SQLITE_PATH'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['SQLITE_PATH'],
+        },
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['SQLITE_PATH'],
+        },
+    }
+    REPLICA_DATABASES = ['replica'] if os.environ.get('SQLITE_REPLICA', 'false').lower() == 'true' else []
+
+DATABASE_ROUTERS = ['courses.db.routers.ReplicaRouter']
+# after a write, the user's reads stay on the primary this long; keep it above the replication lag
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
+
+# Cache
+# Redis in production (set REDIS_URL), local memory otherwise (development and tests)
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'lms',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# seconds a serialized course detail / catalog page stays cached (writes invalidate them earlier)
+COURSE_CACHE_TIMEOUT = int(os.environ.get('COURSE_CACHE_TIMEOUT', 60 * 60))
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 60))
+# seconds a user's enrolled course ids stay cached (0 = load them once per request only)
+ENROLLMENT_CACHE_TIMEOUT = int(os.environ.get('ENROLLMENT_CACHE_TIMEOUT', 60 * 10))
+
+
+# Media processing jobs (courses/jobs.py)
+# 'database': queued in MediaJob and run by `manage.py process_media_jobs`
+# 'immediate': run in-process after the request's transaction commits (local development)
+MEDIA_JOB_BACKEND = os.environ.get('MEDIA_JOB_BACKEND', 'database')
+MEDIA_JOB_MAX_ATTEMPTS = 3
+# seconds after which a job still 'running' is taken to belong to a dead worker and retried
+MEDIA_JOB_LEASE = int(os.environ.get('MEDIA_JOB_LEASE', 60 * 10))
+MEDIA_IMAGE_QUALITY = 82
+MEDIA_THUMBNAIL_WIDTHS = [160, 320, 640]
+MEDIA_PROFILE_PICTURE_WIDTHS = [64, 128, 256]
+
+
+# Request metrics (courses/instrumentation.py), exported at /api/metrics/ for admins
+# seconds each process buffers its numbers before adding them to the shared cache
+REQUEST_METRICS_FLUSH_INTERVAL = int(os.environ.get('REQUEST_METRICS_FLUSH_INTERVAL', 10))
+# log requests slower than this many ms with their most expensive queries (0 disables)
+REQUEST_METRICS_SLOW_MS = int(os.environ.get('REQUEST_METRICS_SLOW_MS', 0))
+# a statement run this many times in one request is reported as a likely N+1
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 5
+
+
+# Daily stats rollup (`manage.py rollup_course_stats`)
+# seconds of recent enrollments/reviews left for the next run, so rows from
+# transactions still in flight are never skipped
+ROLLUP_SAFETY_LAG = 60
+
+
+# Logging
+# structured records from the courses app (e.g. S3 transfer bytes/duration/throughput)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'courses': {'handlers': ['console'], 'level': os.environ.get('COURSES_LOG_LEVEL', 'INFO')},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -191,13 +339,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # request.user is built from the token claims, see courses/authentication.py
+        'courses.authentication.TokenUserAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # used by views that opt into pagination, e.g. the course catalog
+    'PAGE_SIZE': 20,
 }
 
+# PAGE_SIZE is only used by views that set their own pagination_class
+SILENCED_SYSTEM_CHECKS = ['rest_framework.W001']
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -206,6 +360,9 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,  # Issue new refresh token on refresh
     'BLACKLIST_AFTER_ROTATION': True,  # Blacklist old refresh tokens
 }
+# build request.user from the access token's role/profile claims instead of loading the
+# User row; role changes apply at the next token refresh (courses/authentication.py)
+JWT_TOKEN_USER = os.environ.get('JWT_TOKEN_USER', 'true').lower() == 'true'
 
 
 JAZZMIN_SETTINGS = {
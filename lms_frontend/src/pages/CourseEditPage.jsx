@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from "react";
 import { useParams } from "react-router-dom";
 import api from "../utils/api";
+import { uploadLessonVideo } from "../utils/videoUpload";
 import toast from 'react-hot-toast';
 import { confirmAlert } from 'react-confirm-alert';
 import 'react-confirm-alert/src/react-confirm-alert.css'; // Optional basic styles
@@ -57,13 +58,16 @@ const CourseEditPage = () => {
       const formData = new FormData();
       formData.append("title", newLesson.title);
       formData.append("content", newLesson.content);
-      if (newLesson.video) formData.append("video", newLesson.video);
 
       const response = await api.post(`/api/courses/${id}/lessons/`, formData, {
         headers: { "Content-Type": "multipart/form-data" },
       });
 
-      setCourse((prev) => ({ ...prev, lessons: [...prev.lessons, response.data] }));
+      // the video goes directly to S3 once the lesson exists
+      let lesson = response.data;
+      if (newLesson.video) lesson = await uploadLessonVideo(lesson.id, newLesson.video);
+
+      setCourse((prev) => ({ ...prev, lessons: [...prev.lessons, lesson] }));
       setNewLesson({ title: "", content: "", video: null });
       toast.success("Lesson added successfully!");
       
@@ -75,6 +79,17 @@ const CourseEditPage = () => {
     }
   };
 
+  // the course detail only has the lesson outline, so load the body before editing
+  const startEditingLesson = async (lesson) => {
+    try {
+      const response = await api.get(`/api/lessons/${lesson.id}/content/`);
+      const body = response.data.lesson;
+      setEditingLesson({ id: lesson.id, title: body.title, content: body.content, video: null });
+    } catch (error) {
+      console.error("Error loading lesson:", error);
+    }
+  };
+
   const handleEditLesson = async () => {
     setLessonLoading(true);
     const accessToken = localStorage.getItem("accessToken");
@@ -85,8 +100,6 @@ const CourseEditPage = () => {
       // remove video checkbox
       if (removeVideoChecked) {
         formData.append("remove_video", "true");
-      } else if (editingLesson.video instanceof File) {
-        formData.append("video", editingLesson.video);
       }
 
       await api.put(`/api/lessons/${editingLesson.id}/`, formData, {
@@ -96,6 +109,10 @@ const CourseEditPage = () => {
         },
       });
 
+      if (!removeVideoChecked && editingLesson.video instanceof File) {
+        await uploadLessonVideo(editingLesson.id, editingLesson.video);
+      }
+
       await fetchCourse();
       toast.success("Lesson added successfully!");
       setEditingLesson(null);
@@ -109,6 +126,22 @@ const CourseEditPage = () => {
   };
 
   // adding delete lesson logic and using confirm alert to confirm deletion
+  // move a lesson one place up (-1) or down (+1); the whole order is saved in one request
+  const moveLesson = async (index, step) => {
+    const lessons = [...course.lessons];
+    const target = index + step;
+    if (target < 0 || target >= lessons.length) return;
+    [lessons[index], lessons[target]] = [lessons[target], lessons[index]];
+    try {
+      const response = await api.post(`/api/courses/${id}/lessons/reorder/`, {
+        lessons: lessons.map((lesson) => lesson.id),
+      });
+      setCourse({ ...course, lessons: response.data });
+    } catch (error) {
+      toast.error("Failed to reorder lessons");
+    }
+  };
+
   const handleDeleteLesson = (lessonId) => {
     confirmAlert({
       title: 'Confirm Deletion',
@@ -219,14 +252,23 @@ const CourseEditPage = () => {
       {/* showing lessons with edit and delete button  */}
       <div className="mt-10">
         <h2 className="text-2xl font-semibold">Lessons</h2>
-        {course.lessons.map((lesson) => (
+        {course.lessons.map((lesson, index) => (
           <div key={lesson.id} className="border p-4 rounded mt-4">
             <h3 className="text-lg font-bold">{lesson.title}</h3>
-            <p>{lesson.content}</p>
-            {lesson.video_url && <a className="text-blue-500" href={lesson.video_url}>{lesson.video_url}</a>}
+            {lesson.has_video && <p className="text-sm text-gray-500">Has video</p>}
             <div className="space-x-2 mt-2">
               <button
-                onClick={() => setEditingLesson({ id: lesson.id, title: lesson.title, content: lesson.content, video: null })}
+                onClick={() => moveLesson(index, -1)}
+                disabled={index === 0}
+                className="bg-gray-200 px-2 py-1 rounded hover:bg-gray-300 disabled:opacity-50"
+              >↑</button>
+              <button
+                onClick={() => moveLesson(index, 1)}
+                disabled={index === course.lessons.length - 1}
+                className="bg-gray-200 px-2 py-1 rounded hover:bg-gray-300 disabled:opacity-50"
+              >↓</button>
+              <button
+                onClick={() => startEditingLesson(lesson)}
                 className="bg-yellow-500 text-white px-3 py-1 rounded hover:bg-yellow-600"
               >Edit</button>
               <button
@@ -75,7 +75,7 @@ const CoursePage = () => {
               <h3 className="font-semibold">{index + 1}. {lesson.title}</h3>
               <p className="text-gray-600 mt-1">
               {isEnrolled ? (
-                lesson.content.split('\n')[0] // This will show only the first line
+                lesson.has_video ? 'Video lesson' : 'Reading'
               ) : (
                 <em className="text-gray-400">Enroll to view content</em>
               )}
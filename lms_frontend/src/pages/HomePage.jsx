@@ -2,18 +2,31 @@ import React, { useEffect, useState } from 'react';
 import api from '../utils/api';
 import { useNavigate } from 'react-router-dom';
 
+// "url 160w, url 320w, ..." for one format of a thumbnail_srcset
+const toSrcSet = (sizes) =>
+  sizes ? Object.entries(sizes).map(([width, url]) => `${url} ${width}w`).join(', ') : undefined;
+
 const HomePage = () => {
   const [courses, setCourses] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchQuery, setSearchQuery] = useState("");
   const navigate = useNavigate();
   const [selectedCategory, setSelectedCategory] = useState("all");
+  const [ordering, setOrdering] = useState("");
 
+  // search, category and ordering are applied by the API; the search is debounced
   useEffect(() => {
     const fetchCourses = async () => {
+      const params = {};
+      if (searchQuery.trim()) params.search = searchQuery.trim();
+      if (selectedCategory !== "all") params.category = selectedCategory;
+      if (ordering) params.ordering = ordering;
       try {
-        const response = await api.get('/api/courses');
-        setCourses(response.data);
+        const response = await api.get('/api/courses/', { params });
+        setCourses(response.data.results);
+        setNextPage(response.data.next);
       } catch (error) {
         console.error('Error fetching courses:', error);
       } finally {
@@ -21,14 +34,24 @@ const HomePage = () => {
       }
     };
 
-    fetchCourses();
-  }, []);
+    const timer = setTimeout(fetchCourses, 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery, selectedCategory, ordering]);
 
-  const filteredCourses = courses.filter((course) => {
-    const matchesSearch = course.title.toLowerCase().includes(searchQuery.toLowerCase());
-    const matchesCategory = selectedCategory === "all" || course.category === selectedCategory;
-    return matchesSearch && matchesCategory;
-  });
+  // the catalog is cursor paginated, `next` is the url of the following page
+  const loadMoreCourses = async () => {
+    if (!nextPage) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get(nextPage);
+      setCourses((prev) => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error('Error fetching more courses:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const handleCourseClick = (courseId) => {
     navigate(`/course/${courseId}`);
@@ -93,22 +116,42 @@ const HomePage = () => {
         ))}
       </div>
 
+      {/* Sort */}
+      <div className="flex justify-end mb-6">
+        <select
+          value={ordering}
+          onChange={(e) => setOrdering(e.target.value)}
+          className="px-4 py-2 border border-gray-300 rounded-xl shadow-sm focus:ring-2 focus:ring-indigo-400 focus:outline-none"
+        >
+          <option value="">Newest</option>
+          <option value="price">Price: Low to High</option>
+          <option value="-price">Price: High to Low</option>
+          <option value="-rating">Top Rated</option>
+        </select>
+      </div>
+
       {/* Featured Courses */}
       <h2 className="text-2xl font-semibold mb-6 text-gray-800">Featured Courses</h2>
       <div className="grid gap-8 grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4">
-        {filteredCourses.length > 0 ? (
-          filteredCourses.map((course) => (
+        {courses.length > 0 ? (
+          courses.map((course) => (
             <div
               key={course.id}
               className="bg-white border border-gray-100 shadow-md rounded-xl hover:shadow-xl transition duration-300"
               onClick={() => handleCourseClick(course.id)}
             >
               {/* Course Thumbnail and Title and price */}
-              <img
-                src={course.thumbnail ? course.thumbnail : "https://my-lms-videos.s3.eu-north-1.amazonaws.com/no-image.jpg"}
-                alt="Course"
-                className="w-full h-48 object-cover rounded-t-xl"
-              />
+              <picture>
+                <source type="image/webp" srcSet={toSrcSet(course.thumbnail_srcset?.webp)} sizes="(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw" />
+                <img
+                  src={course.thumbnail ? course.thumbnail : "https://my-lms-videos.s3.eu-north-1.amazonaws.com/no-image.jpg"}
+                  srcSet={toSrcSet(course.thumbnail_srcset?.jpg)}
+                  sizes="(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw"
+                  loading="lazy"
+                  alt="Course"
+                  className="w-full h-48 object-cover rounded-t-xl"
+                />
+              </picture>
         
               <div className="p-4">
                 <h3 className="text-lg font-semibold text-gray-800">{course.title}</h3>
@@ -121,6 +164,19 @@ const HomePage = () => {
           <p className="text-gray-500">No courses found matching your search.</p>
         )}
       </div>
+
+      {/* Load More */}
+      {nextPage && (
+        <div className="flex justify-center my-10">
+          <button
+            onClick={loadMoreCourses}
+            disabled={loadingMore}
+            className="px-6 py-3 bg-indigo-600 text-white rounded-xl shadow-md hover:bg-indigo-700 disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more courses'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
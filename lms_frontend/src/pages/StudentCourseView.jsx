@@ -10,6 +10,7 @@ const StudentCourseView = () => {
 
   const [course, setCourse] = useState(null);
   const [selectedLesson, setSelectedLesson] = useState(null);
+  const [lessonBodies, setLessonBodies] = useState({}); // lesson id -> body from /content/
   const [isEnrolled, setIsEnrolled] = useState(false);
   const [loading, setLoading] = useState(true);
 
@@ -18,9 +19,9 @@ const StudentCourseView = () => {
       try {
         const res = await api.get(`/api/courses/${id}`);
         setCourse(res.data);
-        const hasAccess = res.data.lessons?.[0]?.content !== 'Enroll to see the content';
+        const hasAccess = res.data.is_enrolled || res.data.instructor?.id === user?.id;
         setIsEnrolled(hasAccess);
-        if (hasAccess) {
+        if (hasAccess && res.data.lessons.length > 0) {
           setSelectedLesson(res.data.lessons[0]);
         }
       } catch (err) {
@@ -33,6 +34,27 @@ const StudentCourseView = () => {
     fetchCourse();
   }, [id]);
 
+  // the course only has the lesson outline: load the selected lesson's body
+  // together with the next one, so moving on to it is instant
+  useEffect(() => {
+    if (!selectedLesson || lessonBodies[selectedLesson.id]) return;
+    const fetchBody = async () => {
+      try {
+        const res = await api.get(`/api/lessons/${selectedLesson.id}/content/`, { params: { next: 1 } });
+        setLessonBodies((bodies) => {
+          const updated = { ...bodies, [res.data.lesson.id]: res.data.lesson };
+          res.data.next.forEach((lesson) => { updated[lesson.id] = lesson; });
+          return updated;
+        });
+      } catch (err) {
+        console.error('Failed to load lesson', err);
+      }
+    };
+    fetchBody();
+  }, [selectedLesson, lessonBodies]);
+
+  const body = selectedLesson ? lessonBodies[selectedLesson.id] : null;
+
   if (loading) return <div className="p-6">Loading...</div>;
 
   if (!isEnrolled) {
@@ -75,16 +97,18 @@ const StudentCourseView = () => {
         {selectedLesson ? (
           <>
             <h2 className="text-2xl font-bold">{selectedLesson.title}</h2>
-            {selectedLesson.video_url ? (
+            {!body ? (
+              <p className="text-gray-500">Loading lesson...</p>
+            ) : body.video_url ? (
               <video
-                src={selectedLesson.video_url}
+                src={body.video_url}
                 controls
                 className="w-full rounded-xl shadow"
               />
             ) : (
               <p className="italic text-red-500"></p>
             )}
-            <p className="text-gray-700 mt-4">{selectedLesson.content}</p>
+            <p className="text-gray-700 mt-4">{body?.content}</p>
           </>
         ) : (
           <p>Select a lesson to begin.</p>
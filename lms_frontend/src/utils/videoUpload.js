@@ -0,0 +1,35 @@
+import axios from 'axios';
+import api from './api';
+
+// Uploads a lesson video straight to S3: the API hands out one presigned url per part,
+// the browser PUTs each slice of the file and then asks the API to complete the upload.
+// (the bucket's CORS config must expose the ETag header)
+export const uploadLessonVideo = async (lessonId, file, onProgress) => {
+  const uploadUrl = `/api/lessons/${lessonId}/video-upload/`;
+  const { data: upload } = await api.post(uploadUrl, {
+    filename: file.name,
+    size: file.size,
+    content_type: file.type || 'video/mp4',
+  });
+
+  try {
+    const parts = [];
+    for (const part of upload.parts) {
+      const start = (part.part_number - 1) * upload.part_size;
+      const response = await axios.put(part.url, file.slice(start, start + upload.part_size));
+      parts.push({ part_number: part.part_number, etag: response.headers.etag });
+      if (onProgress) onProgress(parts.length / upload.parts.length);
+    }
+
+    const { data: lesson } = await api.post(`${uploadUrl}complete/`, {
+      upload_id: upload.upload_id,
+      key: upload.key,
+      parts,
+    });
+    return lesson;
+  } catch (error) {
+    // don't leave half uploaded parts behind in the bucket
+    await api.delete(uploadUrl, { data: { upload_id: upload.upload_id, key: upload.key } }).catch(() => {});
+    throw error;
+  }
+};